@@ -3,17 +3,22 @@
 import importlib.metadata
 
 from heatlib.boundary_conditions import Boundary_Condition, Dirichlet_BC, Neumann_BC
-from heatlib.domains import Domain_1D
+from heatlib.domains import Domain_1D, Domain_2D
 from heatlib.elements import Element
-from heatlib.models import Model_1D
-from heatlib.simulations import Simulation_1D
+from heatlib.inversion import Inversion_1D
+from heatlib.models import Model_1D, Model_2D
+from heatlib.simulations import Simulation_1D, Simulation_2D
 from heatlib.solvers import (
     BTCS_1D,
+    BTCS_2D,
     Deform_1D,
+    Parareal_1D,
     SetTemperature_1D,
+    SetTemperature_2D,
     SteadyState_1D,
+    SteadyState_2D,
 )
-from heatlib.tracers import Tracer_1D
+from heatlib.tracers import Probe_1D, Tracer_1D, Tracer_2D
 from heatlib.units import (
     Density,
     Heat_Production,
@@ -31,17 +36,27 @@ __all__ = [
     "Specific_Heat_Capacity",
     "Time",
     "Tracer_1D",
+    "Tracer_2D",
+    "Probe_1D",
     "Boundary_Condition",
     "Dirichlet_BC",
     "Neumann_BC",
     "Element",
     "Domain_1D",
+    "Domain_2D",
     "Model_1D",
+    "Model_2D",
     "SetTemperature_1D",
     "SteadyState_1D",
     "BTCS_1D",
     "Deform_1D",
+    "Parareal_1D",
+    "SetTemperature_2D",
+    "SteadyState_2D",
+    "BTCS_2D",
     "Simulation_1D",
+    "Simulation_2D",
+    "Inversion_1D",
 ]
 
 __author__ = """Ondrej Lexa"""
@@ -0,0 +1,53 @@
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from heatlib.scenarios import expand_sweep, load_scenario, run_scenario
+
+#################################################
+#            Command line interface             #
+#################################################
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="heatlib", description="Run heatlib scenarios headless."
+    )
+    parser.add_argument("scenarios", nargs="+", help="TOML or JSON scenario files")
+    parser.add_argument(
+        "-o", "--output-dir", default=None, help="directory for results"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="number of parallel processes"
+    )
+    args = parser.parse_args(argv)
+
+    jobs = []
+    for path in args.scenarios:
+        jobs.extend(expand_sweep(load_scenario(path)))
+
+    failed = 0
+    if args.jobs == 1:
+        for sc in jobs:
+            try:
+                print(f"{sc['name']}: {run_scenario(sc, args.output_dir)}")
+            except Exception as e:
+                failed += 1
+                print(f"{sc['name']}: failed ({e})", file=sys.stderr)
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = {
+                pool.submit(run_scenario, sc, args.output_dir): sc["name"]
+                for sc in jobs
+            }
+            for future in as_completed(futures):
+                try:
+                    print(f"{futures[future]}: {future.result()}")
+                except Exception as e:
+                    failed += 1
+                    print(f"{futures[future]}: failed ({e})", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,8 @@
 from itertools import groupby
 
-import matplotlib.pyplot as plt
 import numpy as np
 
+from heatlib.plotting import value_blocks
 from heatlib.units import Length
 
 #################################################
@@ -10,9 +10,30 @@ from heatlib.units import Length
 #################################################
 
 
+def interpolation_weights(x, xp):
+    """Return indices j and weights w of linear interpolation at x.
+
+    Interpolated values are ``f[j] + w * (f[j + 1] - f[j])``, x outside of
+    increasing nodes xp is clipped to the end nodes as in ``np.interp``.
+    """
+    x = np.clip(x, xp[0], xp[-1])
+    j = np.clip(np.searchsorted(xp, x, side="right") - 1, 0, len(xp) - 2)
+    return j, (x - xp[j]) / (xp[j + 1] - xp[j])
+
+
 class Domain_1D:
+    """Layered domain composed from list of ``Element`` instances.
+
+    Element thicknesses are copied from ``dx`` of elements at construction
+    and later changed only through ``dx`` setter (e.g. by ``Deform_1D``),
+    editing ``dx`` of elements has no effect. Properties ``k``, ``H``,
+    ``rho`` and ``c`` are read from elements, so their in-place edits apply.
+    """
+
     def __init__(self, elements, **kwargs):
         self.elements = elements
+        self._dx = np.array([e.dx for e in elements], dtype=float)
+        self._version = 0  # incremented on every geometry change
         self.figsize = kwargs.get("figsize", (9, 6))  # default figure size
         self.plot_unit = kwargs.get("plot_unit", "m")  # plotting spatial unit
 
@@ -21,9 +42,11 @@ class Domain_1D:
 
     def info(self):
         res = []
+        i = 0
         for e, blk in groupby(self.elements):
             n = len(list(blk))
-            res.append(f"{e.dx * n} {n} {e.info()}")
+            res.append(f"{self._dx[i:i + n].sum():g} {n} {e.info()}")
+            i += n
         return "\n".join(res)
 
     @property
@@ -32,7 +55,7 @@ class Domain_1D:
 
     @property
     def x(self):
-        return np.hstack((0, np.cumsum([e.dx for e in self.elements])))
+        return np.hstack((0, np.cumsum(self._dx)))
 
     @property
     def x_units(self):
@@ -40,9 +63,7 @@ class Domain_1D:
 
     @property
     def xm(self):
-        return np.cumsum([e.dx for e in self.elements]) - np.array(
-            [e.dx / 2 for e in self.elements]
-        )
+        return np.cumsum(self._dx) - self._dx / 2
 
     @property
     def xm_units(self):
@@ -50,7 +71,18 @@ class Domain_1D:
 
     @property
     def dx(self):
-        return np.array([e.dx for e in self.elements])
+        # read-only, changes must go through setter to bump version
+        dx = self._dx.view()
+        dx.flags.writeable = False
+        return dx
+
+    @dx.setter
+    def dx(self, value):
+        dx = np.array(value, dtype=float)
+        assert dx.shape == self._dx.shape, "dx must have one value per element."
+        assert np.all(dx > 0), "dx must be positive."
+        self._dx = dx
+        self._version += 1
 
     @property
     def k(self):
@@ -69,13 +101,125 @@ class Domain_1D:
         return np.array([e.c for e in self.elements])
 
     def show(self, prop="k"):
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=self.figsize)
+        # consecutive elements with same value are drawn as one block
+        y, values = value_blocks(self.x_units, getattr(self, prop))
+        h = ax.pcolormesh([0, 1], y, values[:, None], shading="flat")
+        ax.yaxis.set_inverted(True)
+        cbar = fig.colorbar(h, ax=ax)
+        cbar.minorticks_on()
+        plt.ylabel(f"Depth [{self.plot_unit}]")
+        plt.title(prop)
+        plt.show()
+
+
+class Domain_2D:
+    """Structured rectilinear domain composed from rows of ``Element`` instances.
+
+    ``elements`` is a list of rows ordered from top to bottom, each row being a
+    list of elements ordered from left to right. Column widths are taken from
+    ``dx`` of elements in the first row, row thicknesses from ``dz`` keyword
+    argument (scalar or one value per row).
+    """
+
+    def __init__(self, elements, **kwargs):
+        self.elements = [list(row) for row in elements]
+        ncols = len(self.elements[0])
+        assert all(
+            len(row) == ncols for row in self.elements
+        ), "All rows must have the same number of elements."
+        self._dx = np.array([e.dx for e in self.elements[0]], dtype=float)
+        self._dz = np.abs(kwargs.get("dz", 1)) * np.ones(len(self.elements))
+        self._k = np.array([[e.k for e in row] for row in self.elements], dtype=float)
+        self._H = np.array([[e.H for e in row] for row in self.elements], dtype=float)
+        self._rho = np.array(
+            [[e.rho for e in row] for row in self.elements], dtype=float
+        )
+        self._c = np.array([[e.c for e in row] for row in self.elements], dtype=float)
+        self.figsize = kwargs.get("figsize", (9, 6))  # default figure size
+        self.plot_unit = kwargs.get("plot_unit", "m")  # plotting spatial unit
+
+    def __repr__(self):
+        nz, nx = self._k.shape
+        return f"Domain_2D: ({nz}x{nx} elements)"
+
+    def info(self):
+        res = []
+        for e in sorted(
+            set(e for row in self.elements for e in row), key=lambda e: e.name
+        ):
+            n = sum(row.count(e) for row in self.elements)
+            res.append(f"{n} {e.info()}")
+        return "\n".join(res)
+
+    @property
+    def shape(self):
+        return len(self._dz) + 1, len(self._dx) + 1
+
+    @property
+    def n(self):
+        return (len(self._dz) + 1) * (len(self._dx) + 1)
+
+    @property
+    def x(self):
+        return np.hstack((0, np.cumsum(self._dx)))
+
+    @property
+    def z(self):
+        return np.hstack((0, np.cumsum(self._dz)))
+
+    @property
+    def x_units(self):
+        return (self.x * Length(1).unit).to(self.plot_unit).magnitude
+
+    @property
+    def z_units(self):
+        return (self.z * Length(1).unit).to(self.plot_unit).magnitude
+
+    @property
+    def xm(self):
+        return np.cumsum(self._dx) - self._dx / 2
+
+    @property
+    def zm(self):
+        return np.cumsum(self._dz) - self._dz / 2
+
+    @property
+    def dx(self):
+        return self._dx
+
+    @property
+    def dz(self):
+        return self._dz
+
+    @property
+    def k(self):
+        return self._k
+
+    @property
+    def H(self):
+        return self._H
+
+    @property
+    def rho(self):
+        return self._rho
+
+    @property
+    def c(self):
+        return self._c
+
+    def show(self, prop="k"):
+        import matplotlib.pyplot as plt
+
         fig, ax = plt.subplots(figsize=self.figsize)
-        x = [np.zeros_like(self.x), np.ones_like(self.x)]
-        y = [self.x_units, self.x_units]
-        h = ax.pcolor(x, y, np.atleast_2d(getattr(self, prop)), shading="flat")
+        h = ax.pcolormesh(self.x_units, self.z_units, getattr(self, prop))
         ax.yaxis.set_inverted(True)
+        ax.set_aspect("equal")
         cbar = fig.colorbar(h, ax=ax)
         cbar.minorticks_on()
+        plt.xlabel(f"Distance [{self.plot_unit}]")
         plt.ylabel(f"Depth [{self.plot_unit}]")
         plt.title(prop)
         plt.show()
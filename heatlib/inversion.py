@@ -0,0 +1,176 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import splu
+
+from heatlib.domains import interpolation_weights
+from heatlib.models import Model_1D
+from heatlib.parameters import Parameters_1D
+from heatlib.solvers import BTCS_1D, SteadyState_1D
+
+#################################################
+#            Inversion                          #
+#################################################
+
+def interpolation_matrix(x, xp):
+    """Return sparse matrix P such that P @ T equals np.interp(x, xp, T)."""
+    x = np.abs(np.atleast_1d(x))
+    j, w = interpolation_weights(x, xp)
+    rows = np.repeat(np.arange(len(x)), 2)
+    cols = np.column_stack((j, j + 1)).ravel()
+    vals = np.column_stack((1 - w, w)).ravel()
+    return csr_matrix((vals, (rows, cols)), shape=(len(x), len(xp)))
+
+
+class Inversion_1D:
+    """Adjoint based calibration of element properties from observed temperatures.
+
+    ``params`` is a list of parameter names as in ``Parameters_1D``.
+    Observations are temperatures ``T`` at depths ``x``. When observation
+    times ``time`` (in seconds since the initial state) are given, ``solver``
+    (``BTCS_1D`` instance) defines transient run of ``solver.steps`` steps
+    of ``solver.dt`` starting from steady state (``init="steady"``) or from
+    current ``model.T`` (``init="model"``). Observations are matched by
+    linear interpolation in depth and time.
+
+    Misfit is ``0.5 * sum(((T_pred - T) / sigma)**2)`` and its gradient is
+    computed with one adjoint run. ``fun`` returns both, so it could be used
+    directly as ``scipy.optimize.minimize(inv.fun, inv.x0, jac=True)``.
+    """
+
+    def __init__(self, model, params, x, T, **kwargs):
+        assert isinstance(
+            model, Model_1D
+        ), "You have to use Model_1D instance as argument."
+        self.model = model
+        self.params = list(params)
+        self.x = np.abs(np.atleast_1d(np.asarray(x, dtype=float)))
+        self.T = np.broadcast_to(np.asarray(T, dtype=float), self.x.shape)
+        self.sigma = np.broadcast_to(kwargs.get("sigma", 1.0), self.T.shape)
+        self.time = kwargs.get("time", None)
+        self.solver = kwargs.get("solver", None)
+        self.init = kwargs.get("init", "steady")
+        if self.time is not None:
+            assert isinstance(
+                self.solver, BTCS_1D
+            ), "Transient inversion needs BTCS_1D solver."
+            self.time = np.broadcast_to(
+                np.asarray(self.time, dtype=float), self.x.shape
+            )
+        self.parameters = Parameters_1D(model, params, **kwargs)
+
+    @property
+    def x0(self):
+        return self.parameters.values()
+
+    def set_params(self, theta):
+        """Write parameter values to model elements and boundary conditions."""
+        self.parameters.apply(theta)
+
+    def _observations(self):
+        P = interpolation_matrix(self.x, self.model.domain.x)
+        if self.time is None:
+            return P, {0: (np.arange(len(self.x)), np.ones(len(self.x)))}
+        s = np.clip(self.time / self.solver.dt, 0, self.solver.steps)
+        j0 = np.minimum(np.floor(s).astype(int), self.solver.steps)
+        j1 = np.minimum(j0 + 1, self.solver.steps)
+        w = s - j0
+        steps = {}
+        for i in range(len(s)):
+            for j, wj in ((j0[i], 1 - w[i]), (j1[i], w[i])):
+                if wj != 0:
+                    ix, ws = steps.get(j, ([], []))
+                    steps[j] = (ix + [i], ws + [wj])
+        return P, {j: (np.array(ix), np.array(ws)) for j, (ix, ws) in steps.items()}
+
+    def _forward(self, theta):
+        # temperature fields with factorizations reused by adjoint sweep
+        model = self.parameters.proxy(theta)
+        lu_s, lu, m = None, None, None
+        if self.time is None or self.init == "steady":
+            As, bs = SteadyState_1D().system(model)
+            lu_s = splu(As.tocsc())
+            Ts = [lu_s.solve(bs)]
+        else:
+            Ts = [self.model.T.copy()]
+        if self.time is not None:
+            A, b, m = self.solver.system(model)
+            lu = splu(A.tocsc())
+            for j in range(self.solver.steps):
+                Ts.append(lu.solve(b + m * Ts[-1]))
+        return Ts, lu_s, lu, m
+
+    def forward(self, theta):
+        """Return list of temperature fields, steady state or time steps."""
+        return self._forward(theta)[0]
+
+    def predict(self, theta=None, Ts=None):
+        theta = self.x0 if theta is None else theta
+        Ts = self.forward(theta) if Ts is None else Ts
+        P, steps = self._observations()
+        res = np.zeros(len(self.T))
+        for j, (ix, w) in steps.items():
+            res[ix] += w * (P[ix] @ Ts[j])
+        return res
+
+    def misfit(self, theta):
+        return self.fun(theta)[0]
+
+    def gradient(self, theta):
+        return self.fun(theta)[1]
+
+    def fun(self, theta):
+        theta = np.asarray(theta, dtype=float)
+        Ts, lu_s, lu, m = self._forward(theta)
+        P, steps = self._observations()
+        r = (self.predict(theta, Ts) - self.T) / self.sigma
+        J = 0.5 * np.sum(r**2)
+        rw = r / self.sigma
+        # dJ/dT for each time step
+        dJ = {j: P[ix].T @ (w * rw[ix]) for j, (ix, w) in steps.items()}
+        n = len(Ts[0])
+        # backward adjoint sweep with accumulation of residual sensitivities
+        # sums S = sum(lam_j * T_j) on tridiagonal pattern
+        S = [np.zeros(n), np.zeros(n), np.zeros(n)]
+        Lb = np.zeros(n)
+        Qm = np.zeros(n)
+        lam_next = np.zeros(n)
+        if self.time is not None:
+            for j in range(len(Ts) - 1, 0, -1):
+                rhs = dJ.get(j, 0) + m * lam_next
+                lam = lu.solve(rhs, trans="T")
+                T = Ts[j]
+                S[0] += lam * T
+                S[1][1:] += lam[1:] * T[:-1]
+                S[2][:-1] += lam[:-1] * T[1:]
+                Lb += lam
+                Qm += lam * Ts[j - 1]
+                lam_next = lam
+        grad = np.zeros(len(self.params))
+        if self.time is None or self.init == "steady":
+            rhs = dJ.get(0, 0) + (m * lam_next if m is not None else 0)
+            mu = lu_s.solve(rhs, trans="T")
+            T = Ts[0]
+            Ss = [mu * T, np.zeros(n), np.zeros(n)]
+            Ss[1][1:] = mu[1:] * T[:-1]
+            Ss[2][:-1] = mu[:-1] * T[1:]
+            grad += self._contract(theta, Ss, mu, None, steady=True)
+        if self.time is not None:
+            grad += self._contract(theta, S, Lb, Qm, steady=False)
+        return J, grad
+
+    def _contract(self, theta, S, L, Q, steady):
+        # gradient -sum(lam^T (dA T - db - dm T_prev)), per element rows
+        if steady:
+            derivs = self.parameters.derivatives(SteadyState_1D().system, theta)
+            derivs = [(dA, db, 0) for dA, db in derivs]
+        else:
+            derivs = self.parameters.derivatives(self.solver.system, theta)
+        grad = np.zeros(len(self.params))
+        for i, (dA, db, dm) in enumerate(derivs):
+            row = dA.diagonal(0) * S[0] - db * L
+            if Q is not None:
+                row -= dm * Q
+            row[1:] += dA.diagonal(-1) * S[1][1:]
+            row[:-1] += dA.diagonal(1) * S[2][:-1]
+            grad[i] = -row.sum()
+        return grad
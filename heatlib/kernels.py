@@ -0,0 +1,116 @@
+import numpy as np
+from scipy.linalg.lapack import dgttrf, dgttrs
+
+#################################################
+#            Time-step kernels                  #
+#################################################
+
+# Backends of BTCS_1D time stepping:
+#   "reference" - sparse spsolve per step (original implementation)
+#   "numpy"     - LAPACK tridiagonal factorization reused for all steps
+#                 with right hand side assembled in preallocated buffer
+#   "numba"     - fused in-place Thomas kernel, needs numba installed
+#   "auto"      - "numba" when available, otherwise "numpy"
+
+try:
+    import numba
+except ImportError:  # pragma: no cover
+    numba = None
+
+BACKENDS = ("auto", "reference", "numpy", "numba")
+_backend = "auto"
+
+
+def set_backend(name):
+    """Select default backend used by ``BTCS_1D``."""
+    global _backend
+    assert name in BACKENDS, f"Backend must be one of {BACKENDS}."
+    if name == "numba":
+        assert numba is not None, "Numba backend needs numba installed."
+    _backend = name
+
+
+def get_backend(name=None):
+    """Resolve backend name, ``None`` means the global default."""
+    name = _backend if name is None else name
+    assert name in BACKENDS, f"Backend must be one of {BACKENDS}."
+    if name == "auto":
+        return "numba" if numba is not None else "numpy"
+    if name == "numba":
+        assert numba is not None, "Numba backend needs numba installed."
+    return name
+
+
+def _thomas_steps(lower, inv_denom, cp, b, m, T, work, steps):
+    # steps of A T' = b + m T with prefactorized tridiagonal A, in place
+    n = T.shape[0]
+    for s in range(steps):
+        d = (b[0] + m[0] * T[0]) * inv_denom[0]
+        work[0] = d
+        for i in range(1, n):
+            d = (b[i] + m[i] * T[i] - lower[i] * d) * inv_denom[i]
+            work[i] = d
+        x = work[n - 1]
+        T[n - 1] = x
+        for i in range(n - 2, -1, -1):
+            x = work[i] - cp[i] * x
+            T[i] = x
+
+
+def _thomas_factor(lower, diag, upper, inv_denom, cp):
+    # Thomas factorization, A is diagonally dominant so no pivoting needed
+    c = 0.0
+    for i in range(diag.shape[0]):
+        inv_denom[i] = 1 / (diag[i] - lower[i] * c)
+        c = upper[i] * inv_denom[i]
+        cp[i] = c
+
+
+if numba is not None:
+    _thomas_steps_jit = numba.njit(cache=True, nogil=True)(_thomas_steps)
+    _thomas_factor_jit = numba.njit(cache=True, nogil=True)(_thomas_factor)
+
+
+class Tridiagonal_Stepper:
+    """Repeated solution of ``A T' = b + m T`` for tridiagonal ``A``.
+
+    Factorization and work buffers are prepared once, so ``step`` does not
+    allocate any arrays.
+    """
+
+    def __init__(self, A, b, m, backend=None):
+        self.backend = get_backend(backend)
+        self.b = np.ascontiguousarray(b, dtype=float)
+        self.m = np.ascontiguousarray(m, dtype=float)
+        lower = np.hstack((0, A.diagonal(-1)))
+        diag = A.diagonal(0).astype(float)
+        upper = np.hstack((A.diagonal(1), 0))
+        self.work = np.empty_like(self.b)
+        if self.backend == "numba":
+            self.lower = lower
+            self.cp = np.empty_like(diag)
+            self.inv_denom = np.empty_like(diag)
+            _thomas_factor_jit(lower, diag, upper, self.inv_denom, self.cp)
+        elif self.backend == "numpy":
+            *self.lu, info = dgttrf(lower[1:], diag, upper[:-1])
+            if info != 0:
+                raise RuntimeError(
+                    f"Tridiagonal factorization failed (info={info})."
+                )
+
+    def step(self, T, steps=1):
+        """Advance ``T`` in place by given number of steps."""
+        if self.backend == "numba":
+            _thomas_steps_jit(
+                self.lower, self.inv_denom, self.cp, self.b, self.m, T, self.work, steps
+            )
+        else:
+            work = self.work
+            for i in range(steps):
+                np.multiply(self.m, T, out=work)
+                work += self.b
+                x, info = dgttrs(*self.lu, work, overwrite_b=1)
+                if info != 0:
+                    raise RuntimeError(f"Tridiagonal solve failed (info={info}).")
+                T[:] = x
+        return T
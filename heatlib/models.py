@@ -1,9 +1,9 @@
-import matplotlib.pyplot as plt
 import numpy as np
+from scipy.interpolate import RegularGridInterpolator
 
-from heatlib.boundary_conditions import Boundary_Condition
-from heatlib.domains import Domain_1D
-from heatlib.solvers import Solver_1D
+from heatlib.boundary_conditions import Boundary_Condition, Neumann_BC
+from heatlib.domains import Domain_1D, Domain_2D
+from heatlib.solvers import Solver_1D, Solver_2D
 from heatlib.units import Time
 
 #################################################
@@ -32,6 +32,11 @@ class Model_1D:
         self.figsize = kwargs.get("figsize", (9, 6))  # default figure size
         self.T = None
         self._time_abs = 0.0
+        # optional Parameters_1D and sensitivities dT/dparam (n x n_params)
+        self.parameters = None
+        self.S = None
+        # Probe_1D instances sampled after each time step
+        self.probes = []
 
     @property
     def time(self):
@@ -44,6 +49,16 @@ class Model_1D:
             print("Model has not yet solution.")
             return None
 
+    def sample_probes(self):
+        for probe in self.probes:
+            probe.sample(self)
+
+    def get_S(self, x):
+        if self.S is not None:
+            return np.array([np.interp(abs(x), self.domain.x, s) for s in self.S.T])
+        else:
+            return None
+
     def __repr__(self):
         if self.T is None:
             return "No solutions. Ready for initial one."
@@ -64,6 +79,8 @@ class Model_1D:
         solver.solve(self, **kwargs)
 
     def plot(self):
+        import matplotlib.pyplot as plt
+
         if self.T is not None:
             fig, ax = plt.subplots(figsize=self.figsize)
             if self.orientation == "vertical":
@@ -87,3 +104,94 @@ class Model_1D:
             plt.show()
         else:
             print("Model has not yet any solution.")
+
+
+class Model_2D:
+    """Model on ``Domain_2D``.
+
+    ``bc0`` and ``bc1`` are top and bottom boundary conditions, left and right
+    ones are given by ``bcl`` and ``bcr`` keyword arguments and default to
+    zero flux. Neumann BC value is heat flux in the positive direction of the
+    axis normal to the edge, i.e. the same convention as in ``Model_1D``.
+    """
+
+    def __init__(self, domain, bc0, bc1, **kwargs):
+        assert isinstance(
+            domain, Domain_2D
+        ), "You have to use Domain_2D instance as argument."
+        assert isinstance(
+            bc0, Boundary_Condition
+        ), "Second argument must be Boundary_Condition."
+        assert isinstance(
+            bc1, Boundary_Condition
+        ), "Third argument must be Boundary_Condition."
+        self.domain = domain
+        self.bc0 = bc0
+        self.bc1 = bc1
+        self.bcl = kwargs.get("bcl", Neumann_BC(0))
+        self.bcr = kwargs.get("bcr", Neumann_BC(0))
+        assert isinstance(self.bcl, Boundary_Condition) and isinstance(
+            self.bcr, Boundary_Condition
+        ), "bcl and bcr must be Boundary_Condition."
+        self.time_unit = kwargs.get("time_unit", "s")  # default plotting time units
+        self.figsize = kwargs.get("figsize", (9, 6))  # default figure size
+        self.T = None
+        self._time_abs = 0.0
+
+    @property
+    def time(self):
+        return (self._time_abs * Time(1).unit).to(self.time_unit).magnitude
+
+    def get_T(self, x, z):
+        if self.T is not None:
+            interp = RegularGridInterpolator(
+                (self.domain.z, self.domain.x), self.T, bounds_error=False
+            )
+            x, z = np.broadcast_arrays(
+                np.clip(x, 0, self.domain.x[-1]), np.clip(abs(z), 0, self.domain.z[-1])
+            )
+            T = interp(np.column_stack((z.ravel(), x.ravel()))).reshape(z.shape)
+            return T.item() if T.ndim == 0 else T
+        else:
+            print("Model has not yet solution.")
+            return None
+
+    def __repr__(self):
+        if self.T is None:
+            return "No solutions. Ready for initial one."
+        elif self._time_abs == 0.0:
+            return "Model with initial solution"
+        else:
+            return f"Model with evolutionary solution for time {self.time:g}{self.time_unit}"
+
+    def info(self):
+        print(f"Top {self.bc0}")
+        print(f"Bottom {self.bc1}")
+        print(f"Left {self.bcl}")
+        print(f"Right {self.bcr}")
+        print(self.domain.info())
+
+    def solve(self, solver, **kwargs):
+        assert isinstance(
+            solver, Solver_2D
+        ), "You have to use Solver_2D instance as argument."
+        solver.solve(self, **kwargs)
+
+    def plot(self):
+        import matplotlib.pyplot as plt
+
+        if self.T is not None:
+            fig, ax = plt.subplots(figsize=self.figsize)
+            h = ax.pcolormesh(
+                self.domain.x_units, self.domain.z_units, self.T, shading="gouraud"
+            )
+            ax.yaxis.set_inverted(True)
+            ax.set_aspect("equal")
+            cbar = fig.colorbar(h, ax=ax)
+            cbar.set_label("Temperature [°C]")
+            ax.set_xlabel(f"Distance [{self.domain.plot_unit}]")
+            ax.set_ylabel(f"Depth [{self.domain.plot_unit}]")
+            ax.set_title(f"t={self.time:g}{self.time_unit}")
+            plt.show()
+        else:
+            print("Model has not yet any solution.")
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+#################################################
+#            Model parameters                   #
+#################################################
+
+PROPERTIES = ("k", "H", "rho", "c")
+
+
+class Parameters_1D:
+    """Selection of layer properties and BC values of ``Model_1D``.
+
+    ``names`` is a list of ``"name.prop"`` strings, where ``name`` is name of
+    elements forming a layer and ``prop`` one of ``k``, ``H``, ``rho`` or
+    ``c``, or ``"bc0"`` and ``"bc1"`` for boundary condition values.
+    """
+
+    def __init__(self, model, names, **kwargs):
+        self.model = model
+        self.names = list(names)
+        self.h = kwargs.get("h", 1e-20)  # complex step
+        elements = np.array([e.name for e in model.domain.elements])
+        self._masks = {}
+        for p in self.names:
+            if p not in ("bc0", "bc1"):
+                name, prop = p.rsplit(".", 1)
+                assert prop in PROPERTIES, f"Unknown property {prop}."
+                mask = elements == name
+                assert mask.any(), f"No elements named {name}."
+                self._masks[p] = mask
+
+    def __repr__(self):
+        return f"Parameters_1D: {', '.join(self.names)}"
+
+    def __len__(self):
+        return len(self.names)
+
+    def values(self):
+        dom = self.model.domain
+        res = []
+        for p in self.names:
+            if p in ("bc0", "bc1"):
+                res.append(getattr(self.model, p).value)
+            else:
+                prop = p.rsplit(".", 1)[1]
+                res.append(getattr(dom, prop)[self._masks[p]].mean())
+        return np.array(res, dtype=float)
+
+    def apply(self, theta):
+        """Write parameter values to model elements and boundary conditions."""
+        for p, value in zip(self.names, theta):
+            if p in ("bc0", "bc1"):
+                getattr(self.model, p).value = value
+            else:
+                prop = p.rsplit(".", 1)[1]
+                for e, m in zip(self.model.domain.elements, self._masks[p]):
+                    if m:
+                        setattr(e, prop, value)
+
+    def proxy(self, theta=None, dtype=float):
+        """Return lightweight model with property arrays for system assembly."""
+        dom = self.model.domain
+        props = {p: getattr(dom, p).astype(dtype) for p in PROPERTIES}
+        bcs = {
+            b: type(getattr(self.model, b))(getattr(self.model, b).value)
+            for b in ("bc0", "bc1")
+        }
+        if theta is not None:
+            for p, value in zip(self.names, theta):
+                if p in bcs:
+                    bcs[p].value = value
+                else:
+                    props[p.rsplit(".", 1)[1]][self._masks[p]] = value
+        domain = SimpleNamespace(dx=dom.dx, n=dom.n, **props)
+        return SimpleNamespace(domain=domain, **bcs)
+
+    def derivatives(self, system, theta=None):
+        """Return derivatives of ``system(model)`` outputs for each parameter.
+
+        Derivatives are evaluated by complex step, so ``system`` could be any
+        solver assembly function, e.g. ``BTCS_1D().system``.
+        """
+        res = []
+        for p in self.names:
+            model = self.proxy(theta, dtype=complex)
+            if p in ("bc0", "bc1"):
+                bc = getattr(model, p)
+                bc.value = bc.value + 1j * self.h
+            else:
+                arr = getattr(model.domain, p.rsplit(".", 1)[1])
+                mask = self._masks[p]
+                arr[mask] = arr[mask] + 1j * self.h
+            res.append(tuple(o.imag / self.h for o in system(model)))
+        return res
@@ -0,0 +1,108 @@
+import numpy as np
+
+from heatlib.units import Length, Time
+
+#################################################
+#            Plotting helpers                   #
+#################################################
+
+
+def downsample_index(values, n):
+    """Return sorted indices of at most ``n`` points preserving curve shape.
+
+    Values are split into ``n // 2`` buckets and the minimum and maximum of
+    each bucket are kept together with the first and last point, so peaks
+    and steps are never lost when the curve is drawn at screen resolution.
+    """
+    values = np.asarray(values)
+    size = len(values)
+    nb = max(n // 2 - 1, 1)
+    if size <= n or size <= 2 * nb:
+        return np.arange(size)
+    width = -(-size // nb)
+    padded = np.empty(nb * width, dtype=values.dtype)
+    padded[:size] = values
+    padded[size:] = values[-1]
+    buckets = padded.reshape(nb, width)
+    base = np.arange(nb) * width
+    idx = np.hstack(
+        (0, base + buckets.argmin(axis=1), base + buckets.argmax(axis=1), size - 1)
+    )
+    return np.unique(np.minimum(idx, size - 1))
+
+
+def screen_points(ax, vertical=True):
+    """Return number of device pixels along plot axis."""
+    bbox = ax.get_window_extent()
+    return max(int(bbox.height if vertical else bbox.width), 2)
+
+
+def value_blocks(x, values):
+    """Merge consecutive equal values, returning block edges and values."""
+    values = np.asarray(values)
+    change = np.hstack((True, values[1:] != values[:-1]))
+    return np.hstack((x[:-1][change], x[-1])), values[change]
+
+
+class LivePlot:
+    """Incrementally updated figure of running ``Simulation_1D``.
+
+    Left panel shows current temperature profile decimated to screen
+    resolution, right panel time-depth image filled snapshot by snapshot on
+    fixed depth grid of ``resolution`` points.
+    """
+
+    def __init__(self, sim, **kwargs):
+        import matplotlib.pyplot as plt
+
+        self.plt = plt
+        self.sim = sim
+        self.resolution = kwargs.get("resolution", 500)
+        self.f = abs(Length(1, sim.model.domain.plot_unit))
+        self.tf = abs(Time(1, sim.model.time_unit))
+        self.count = 0
+        self.fig, (self.ax, self.ax_field) = plt.subplots(
+            1, 2, figsize=sim.figsize, sharey=True
+        )
+        (self.line,) = self.ax.plot([], [])
+        self.ax.set_xlabel("Temperature [°C]")
+        self.ax.set_ylabel(f"Depth [{sim.model.domain.plot_unit}]")
+        self.ax_field.set_xlabel("Snapshot")
+        self.field = None
+        self.image = None
+        self.depth = None
+        self._interactive = plt.isinteractive()
+        plt.ion()
+
+    def close(self):
+        """Restore interactive mode active before the plot was created."""
+        if not self._interactive:
+            self.plt.ioff()
+
+    def update(self, sol):
+        x = sol["x"] / self.f
+        T = sol["T"]
+        if self.depth is None:
+            self.depth = np.linspace(0, x[-1], self.resolution)
+            self.field = np.full((self.resolution, self.sim.repeat + 1), np.nan)
+            self.image = self.ax_field.imshow(
+                self.field,
+                aspect="auto",
+                interpolation="nearest",
+                extent=(-0.5, self.sim.repeat + 0.5, -self.depth[-1], 0),
+            )
+            self.fig.colorbar(self.image, ax=self.ax_field, label="Temperature [°C]")
+        i = self.count
+        self.count += 1
+        if i < self.field.shape[1]:
+            self.field[:, i] = np.interp(self.depth, x, T, right=np.nan)
+            self.image.set_data(self.field)
+            self.image.set_clim(np.nanmin(self.field), np.nanmax(self.field))
+        idx = downsample_index(T, 2 * screen_points(self.ax))
+        self.line.set_data(T[idx], -x[idx])
+        self.ax.relim()
+        self.ax.autoscale_view()
+        tm = sol["time_abs"] / self.tf
+        self.ax.set_title(f"t={tm:g}{self.sim.model.time_unit}")
+        self.fig.canvas.draw_idle()
+        self.plt.pause(0.001)
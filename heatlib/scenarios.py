@@ -0,0 +1,229 @@
+import copy
+import itertools
+import json
+import tomllib
+from pathlib import Path
+
+import numpy as np
+
+from heatlib.boundary_conditions import Dirichlet_BC, Neumann_BC
+from heatlib.domains import Domain_1D
+from heatlib.elements import Element
+from heatlib.models import Model_1D
+from heatlib.simulations import Simulation_1D
+from heatlib.solvers import (
+    BTCS_1D,
+    Deform_1D,
+    Parareal_1D,
+    SetTemperature_1D,
+    SteadyState_1D,
+)
+from heatlib.tracers import Probe_1D, Tracer_1D
+from heatlib.units import (
+    Density,
+    Heat_Production,
+    Length,
+    Specific_Heat_Capacity,
+    Thermal_Conductivity,
+    Time,
+)
+
+#################################################
+#            Scenarios                          #
+#################################################
+
+# Declarative scenario description, e.g. in TOML
+#
+#   name = "intrusion"
+#   [model]
+#   time_unit = "year"
+#   [[layers]]
+#   name = "UC"
+#   n = 150
+#   dx = 100
+#   k = 2.5
+#   H = "1 uW/m^3"
+#   [bc]
+#   top = {type = "dirichlet", value = 0}
+#   bottom = {type = "neumann", value = -0.032}
+#   [[init]]
+#   solver = "SteadyState"
+#   [[init]]
+#   solver = "SetTemperature"
+#   xmin = "10 km"
+#   xmax = "15 km"
+#   value = 700
+#   [[sim]]
+#   solver = "BTCS"
+#   dt = "5000 year"
+#   [simulation]
+#   repeat = 10
+#   [[tracers]]
+#   name = "A"
+#   x = "12 km"
+#   [[probes]]
+#   name = "borehole"
+#   x = ["1 km", "2 km", "3 km"]
+#   dtype = "float32"
+#   [sweep]
+#   "sim.0.dt" = ["1000 year", "5000 year"]
+#
+# Numeric values are in SI units, strings are parsed as "value unit".
+
+SOLVERS = {
+    "SteadyState": SteadyState_1D,
+    "SetTemperature": SetTemperature_1D,
+    "BTCS": BTCS_1D,
+    "Deform": Deform_1D,
+    "Parareal": Parareal_1D,
+}
+
+BCS = {
+    "dirichlet": Dirichlet_BC,
+    "neumann": Neumann_BC,
+}
+
+QUANTITIES = {
+    "dx": Length,
+    "x": Length,
+    "xmin": Length,
+    "xmax": Length,
+    "k": Thermal_Conductivity,
+    "H": Heat_Production,
+    "rho": Density,
+    "c": Specific_Heat_Capacity,
+    "dt": Time,
+}
+
+
+def quantity(key, value):
+    if isinstance(value, str) and key in QUANTITIES:
+        val, _, unit = value.strip().partition(" ")
+        if unit:
+            return abs(QUANTITIES[key](float(val), unit.strip()))
+        return float(val)
+    return value
+
+
+def load_scenario(path):
+    path = Path(path)
+    if path.suffix == ".json":
+        with open(path) as f:
+            scenario = json.load(f)
+    else:
+        with open(path, "rb") as f:
+            scenario = tomllib.load(f)
+    scenario.setdefault("name", path.stem)
+    return scenario
+
+
+def set_item(scenario, key, value):
+    *parents, last = key.split(".")
+    node = scenario
+    for p in parents:
+        node = node[int(p)] if isinstance(node, list) else node.setdefault(p, {})
+    if isinstance(node, list):
+        node[int(last)] = value
+    else:
+        node[last] = value
+
+
+def expand_sweep(scenario):
+    """Return list of scenarios for cartesian product of sweep values."""
+    sweep = scenario.get("sweep", {})
+    if not sweep:
+        return [scenario]
+    res = []
+    keys = list(sweep)
+    for i, values in enumerate(itertools.product(*(sweep[k] for k in keys))):
+        sc = copy.deepcopy({k: v for k, v in scenario.items() if k != "sweep"})
+        for key, value in zip(keys, values):
+            set_item(sc, key, value)
+        sc["name"] = f"{scenario['name']}_{i:04d}"
+        sc["params"] = dict(zip(keys, values))
+        res.append(sc)
+    return res
+
+
+def build_element(layer):
+    props = {k: quantity(k, v) for k, v in layer.items() if k not in ("name", "n")}
+    return layer.get("n", 1) * Element(layer.get("name", "E"), **props)
+
+
+def build_bc(bc):
+    return BCS[bc.get("type", "dirichlet").lower()](bc.get("value", 0))
+
+
+def build_solver(spec):
+    kwargs = {k: quantity(k, v) for k, v in spec.items() if k != "solver"}
+    return SOLVERS[spec["solver"]](**kwargs)
+
+
+def build_simulation(scenario):
+    model_opts = scenario.get("model", {})
+    geom = []
+    for layer in scenario["layers"]:
+        geom += build_element(layer)
+    domain = Domain_1D(geom, plot_unit=model_opts.get("plot_unit", "m"))
+    model = Model_1D(
+        domain,
+        build_bc(scenario["bc"]["top"]),
+        build_bc(scenario["bc"]["bottom"]),
+        time_unit=model_opts.get("time_unit", "s"),
+    )
+    tracers = [
+        Tracer_1D(t["name"], quantity("x", t["x"])) for t in scenario.get("tracers", [])
+    ]
+    probes = [
+        Probe_1D(
+            p["name"],
+            [quantity("x", x) for x in p["x"]],
+            dtype=p.get("dtype", "float64"),
+        )
+        for p in scenario.get("probes", [])
+    ]
+    return Simulation_1D(
+        model,
+        [build_solver(s) for s in scenario.get("init", [])],
+        [build_solver(s) for s in scenario.get("sim", [])],
+        tracers=tracers if tracers else None,
+        probes=probes,
+        **scenario.get("simulation", {}),
+    )
+
+
+def run_scenario(scenario, output_dir=None):
+    """Run scenario and write results to ``<output_dir>/<name>.npz``.
+
+    When ``output_dir`` is not given, ``dir`` of scenario ``output`` section
+    or current directory is used.
+    """
+    sim = build_simulation(scenario)
+    sim.run()
+    res = results(sim, scenario)
+    if output_dir is None:
+        output_dir = scenario.get("output", {}).get("dir", ".")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"{scenario['name']}.npz"
+    np.savez_compressed(path, **res)
+    return path
+
+
+def results(sim, scenario):
+    """Return dict of result arrays of finished simulation."""
+    res = dict(
+        time_abs=np.array([sol["time_abs"] for sol in sim._sols]),
+        x=np.array([sol["x"] for sol in sim._sols]),
+        T=np.array([sol["T"] for sol in sim._sols]),
+        scenario=json.dumps(scenario),
+    )
+    for tracer in sim.tracers or []:
+        res[f"tracer_{tracer.name}_T"] = tracer.T_all
+        res[f"tracer_{tracer.name}_x"] = np.array(tracer.store["x"])
+        res[f"tracer_{tracer.name}_time_abs"] = np.array(tracer.store["time_abs"])
+    for probe in sim.model.probes:
+        res[f"probe_{probe.name}_T"] = probe.T
+        res[f"probe_{probe.name}_x"] = probe._x
+        res[f"probe_{probe.name}_time_abs"] = probe._time_abs[: len(probe.T)]
+    return res
@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import multiprocessing
+import queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from heatlib.scenarios import build_simulation, results
+
+#################################################
+#            Job service                        #
+#################################################
+
+# Scenario keys which do not change computed results
+IGNORED_KEYS = ("name", "output", "params")
+# Seconds between checks whether worker is still alive
+POLL_INTERVAL = 0.5
+
+
+def fingerprint(scenario):
+    """Return hash identifying physically identical scenarios."""
+    data = {k: v for k, v in scenario.items() if k not in IGNORED_KEYS}
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def _run_job(scenario, events, cancel):
+    # executed in worker process, events are streamed through manager queue
+    try:
+        sim = build_simulation(scenario)
+        total = sim.repeat + 1
+        for i, sol in enumerate(sim.iterate()):
+            if cancel.is_set():
+                events.put(("cancelled", None))
+                return None
+            events.put(("progress", dict(step=i + 1, total=total)))
+            events.put(("snapshot", dict(sol)))
+        res = results(sim, scenario)
+        events.put(("done", res))
+        return res
+    except Exception as e:
+        events.put(("error", repr(e)))
+        raise
+    finally:
+        events.put(("end", None))
+
+
+class Job:
+    """Simulation job shared by all clients submitting the same scenario."""
+
+    def __init__(self, id, scenario, priority):
+        self.id = id
+        self.scenario = scenario
+        self.fingerprint = fingerprint(scenario)
+        self.priority = priority
+        self.state = "queued"
+        self.clients = 0
+        self.history = []
+        self._subscribers = []
+        self._result = asyncio.get_running_loop().create_future()
+        self._cancel = None
+
+    def __repr__(self):
+        return f"Job {self.id}: {self.scenario.get('name', '')} ({self.state})"
+
+    @property
+    def finished(self):
+        return self.state in ("done", "failed", "cancelled")
+
+    def _publish(self, kind, data):
+        # only latest progress and snapshot are kept for late subscribers
+        if kind in ("progress", "snapshot"):
+            self.history = [ev for ev in self.history if ev[0] != kind]
+        self.history.append((kind, data))
+        for q in self._subscribers:
+            q.put_nowait((kind, data))
+
+    def _finish(self, state, result=None, error=None):
+        self.state = state
+        # only final event is kept for late subscribers, snapshots are dropped
+        self.history = [
+            ev for ev in self.history[-1:] if ev[0] in ("done", "error", "cancelled")
+        ]
+        if not self._result.done():
+            if state == "done":
+                self._result.set_result(result)
+            elif state == "failed":
+                self._result.set_exception(RuntimeError(error))
+            else:
+                self._result.cancel()
+        for q in self._subscribers:
+            q.put_nowait(None)
+
+    async def events(self):
+        """Asynchronously iterate over ``(kind, data)`` events of the job.
+
+        Kinds are ``progress``, ``snapshot``, ``done``, ``error`` and
+        ``cancelled``. Events emitted before subscription are replayed, only
+        the latest ``progress`` and ``snapshot`` of running job and only the
+        final event of finished job.
+        """
+        q = asyncio.Queue()
+        for ev in self.history:
+            q.put_nowait(ev)
+        if self.finished:
+            q.put_nowait(None)
+        self._subscribers.append(q)
+        try:
+            while (ev := await q.get()) is not None:
+                yield ev
+        finally:
+            self._subscribers.remove(q)
+
+    async def result(self):
+        return await asyncio.shield(self._result)
+
+
+class JobService:
+    """Local asyncio queue running heatlib scenarios on a process pool.
+
+    Jobs are ordered by ``priority`` (lower first). ``submit`` waits when
+    ``max_queued`` jobs are already waiting, so producers are slowed down
+    instead of exhausting memory. Scenarios with the same fingerprint are
+    computed once and shared by all clients. At most ``max_finished``
+    finished jobs are kept for reuse, older ones are forgotten.
+
+    Usage::
+
+        async with JobService(workers=4) as service:
+            job = await service.submit(scenario)
+            async for kind, data in job.events():
+                ...
+            res = await job.result()
+    """
+
+    def __init__(self, workers=None, max_queued=100, max_finished=1000):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.jobs = {}
+        self._finished = deque()
+        self._counter = itertools.count()
+        self._queue = None
+        self._pool = None
+        self._manager = None
+        self._tasks = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def start(self):
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_queued)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._manager = multiprocessing.Manager()
+        self._tasks = [
+            asyncio.create_task(self._dispatch()) for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        running = [
+            job._result for job in self.jobs.values() if job.state == "running"
+        ]
+        for job in list(self.jobs.values()):
+            if not job.finished:
+                job.clients = 1
+                self.cancel(job)
+        # running jobs report cancellation before dispatchers are stopped
+        if running:
+            await asyncio.wait(running)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for job in list(self.jobs.values()):
+            if not job.finished:
+                job._publish("cancelled", None)
+                self._finish(job, "cancelled")
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._manager.shutdown()
+
+    async def submit(self, scenario, priority=0):
+        """Queue scenario and return its ``Job``.
+
+        Already queued, running or finished identical scenario is reused.
+        """
+        fp = fingerprint(scenario)
+        for job in self.jobs.values():
+            if job.fingerprint == fp and job.state not in ("failed", "cancelled"):
+                job.clients += 1
+                return job
+        job = Job(next(self._counter), scenario, priority)
+        job.clients = 1
+        self.jobs[job.id] = job
+        await self._queue.put((priority, job.id, job))
+        return job
+
+    def cancel(self, job):
+        """Withdraw one client from job, job is cancelled when none remain."""
+        job.clients -= 1
+        if job.clients > 0 or job.finished:
+            return
+        if job.state == "queued":
+            job._publish("cancelled", None)
+            self._finish(job, "cancelled")
+        elif job._cancel is not None:
+            job._cancel.set()
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            priority, id, job = await self._queue.get()
+            try:
+                if job.state == "queued":
+                    await self._execute(loop, job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, loop, job):
+        job.state = "running"
+        events = self._manager.Queue()
+        job._cancel = self._manager.Event()
+        pool = self._pool
+        future = loop.run_in_executor(pool, _run_job, job.scenario, events, job._cancel)
+        state, result, error = "failed", None, None
+        while True:
+            try:
+                kind, data = await loop.run_in_executor(
+                    None, events.get, True, POLL_INTERVAL
+                )
+            except queue.Empty:
+                # worker killed without reporting the end
+                if future.done():
+                    break
+                continue
+            if kind == "end":
+                break
+            job._publish(kind, data)
+            if kind == "done":
+                state, result = "done", data
+            elif kind == "cancelled":
+                state = "cancelled"
+            elif kind == "error":
+                error = data
+        try:
+            await future
+        except BrokenProcessPool as e:
+            state, error = "failed", error or repr(e)
+            job._publish("error", error)
+            if self._pool is pool:
+                pool.shutdown(wait=False)
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        except Exception as e:
+            state, error = "failed", error or repr(e)
+        self._finish(job, state, result, error)
+
+    def _finish(self, job, state, result=None, error=None):
+        job._finish(state, result, error)
+        self._finished.append(job.id)
+        while len(self._finished) > self.max_finished:
+            self.jobs.pop(self._finished.popleft(), None)
@@ -1,8 +1,14 @@
-import matplotlib.pyplot as plt
+import os
+import shutil
+import tempfile
+import weakref
+
 import numpy as np
 
-from heatlib.solvers import Solver_1D
-from heatlib.tracers import Tracer_1D
+from heatlib.parameters import Parameters_1D
+from heatlib.plotting import LivePlot, downsample_index, screen_points
+from heatlib.solvers import Solver_1D, Solver_2D
+from heatlib.tracers import Probe_1D, Tracer_1D, Tracer_2D
 from heatlib.units import Length, Time
 
 #################################################
@@ -11,27 +17,70 @@ from heatlib.units import Length, Time
 
 
 class Simulation_1D:
+    solver_type = Solver_1D
+    tracer_type = Tracer_1D
+
     def __init__(self, model, init_solvers, sim_solvers, **kwargs):
         # args
         self.model = model
-        if isinstance(init_solvers, Solver_1D):
+        if isinstance(init_solvers, self.solver_type):
             self.init_solvers = [init_solvers]
         else:
             self.init_solvers = init_solvers
-        if isinstance(sim_solvers, Solver_1D):
+        if isinstance(sim_solvers, self.solver_type):
             self.sim_solvers = [sim_solvers]
         else:
             self.sim_solvers = sim_solvers
         tracers = kwargs.get("tracers", None)
-        if isinstance(tracers, Tracer_1D):
+        if isinstance(tracers, self.tracer_type):
             self.tracers = [tracers]
         else:
             self.tracers = tracers
         # kwargs
         self.repeat = kwargs.get("repeat", 1)
         self.figsize = kwargs.get("figsize", (9, 6))  # default figure size
+        # storage precision and memory budget in bytes for stored snapshots,
+        # files spilled to given spill_dir are left to the user, temporary
+        # spill directory is removed with the simulation
+        self.store_dtype = np.dtype(kwargs.get("store_dtype", np.float64))
+        self.memory_budget = kwargs.get("memory_budget", None)
+        self.overflow = kwargs.get("overflow", "decimate")  # or "spill"
+        self.spill_dir = kwargs.get("spill_dir", None)
+        self._cleanup = None
+        if self.tracers is not None:
+            for tracer in self.tracers:
+                tracer.set_dtype(self.store_dtype)
+        # first order sensitivities for given parameters and their covariance,
+        # those of previous simulation of the same model are discarded
+        sensitivities = kwargs.get("sensitivities", None)
+        self.model.parameters = (
+            Parameters_1D(self.model, sensitivities)
+            if sensitivities is not None
+            else None
+        )
+        self.model.S = (
+            np.zeros((self.model.domain.n, len(self.model.parameters.names)))
+            if sensitivities is not None
+            else None
+        )
+        self.covariance = kwargs.get("covariance", None)
+        # fixed depth probes sampled every time step, those of previous
+        # simulation of the same model are discarded
+        probes = kwargs.get("probes", [])
+        self.model.probes = [probes] if isinstance(probes, Probe_1D) else list(probes)
         # init
         self._sols = []
+        self._nbytes = 0  # bytes of snapshots held in memory
+        self._spilled = 0  # number of leading snapshots spilled to disk
+        # decimation keeps every stride-th snapshot and always the last one,
+        # which is provisional and replaced when it is off the stride
+        self._stride = 1
+        self._count = 0
+        self._indices = []
+        self._provisional = False
+        self.storage_stats = dict(
+            max_abs_error=0.0, max_rel_error=0.0, decimated=0, spilled=0
+        )
 
     def time_steps(self):
         return np.array(
@@ -39,45 +88,267 @@ class Simulation_1D:
         )
 
     def plot(self, **kwargs):
+        """Plot stored temperature profiles.
+
+        Curves are decimated to screen resolution preserving extremes. When
+        more than ``max_legend`` profiles are plotted, they are drawn as
+        single collection colored by time.
+        """
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import LineCollection
+
         solutions = kwargs.pop("solutions", range(len(self._sols)))
+        max_legend = kwargs.pop("max_legend", 20)
         fig, ax = plt.subplots(figsize=self.figsize)
+        n = kwargs.pop("max_points", 2 * screen_points(ax))
+        fx = abs(Length(1, self.model.domain.plot_unit))
+        ft = abs(Time(1, self.model.time_unit))
+        curves, times = [], []
         for sol in solutions:
-            T = self._sols[sol]["T"]
-            x = self._sols[sol]["x"] / abs(Length(1, self.model.domain.plot_unit))
-            tm = self._sols[sol]["time_abs"] / abs(Time(1, self.model.time_unit))
-            lbl = f"{tm:g}"
-            ax.plot(T, -x, label=lbl)
-            ax.set_xlabel("Temperature [°C]")
-            ax.set_ylabel(f"Depth [{self.model.domain.plot_unit}]")
+            T = np.asarray(self._sols[sol]["T"])
+            x = np.asarray(self._sols[sol]["x"]) / fx
+            idx = downsample_index(T, n)
+            curves.append(np.column_stack((T[idx], -x[idx])))
+            times.append(self._sols[sol]["time_abs"] / ft)
+        if len(curves) <= max_legend:
+            for curve, tm in zip(curves, times):
+                ax.plot(*curve.T, label=f"{tm:g}")
             ax.legend(loc="best", title=f"Time [{self.model.time_unit}]")
+        else:
+            lc = LineCollection(curves, array=np.array(times), cmap="viridis")
+            ax.add_collection(lc)
+            ax.autoscale_view()
+            fig.colorbar(lc, ax=ax, label=f"Time [{self.model.time_unit}]")
+        ax.set_xlabel("Temperature [°C]")
+        ax.set_ylabel(f"Depth [{self.model.domain.plot_unit}]")
         plt.show()
 
-    def run(self):
-        # Init solvers
-        for s in self.init_solvers:
-            s.solve(self.model, tracers=self.tracers)
-        self._sols.append(
-            dict(
-                time_abs=self.model._time_abs,
-                x=self.model.domain.x.copy(),
-                T=self.model.T.copy(),
-            )
+    def plot_field(self, **kwargs):
+        """Plot time-depth temperature field of stored snapshots as one image.
+
+        Field is strided to at most ``max_size`` (time, depth) samples.
+        """
+        import matplotlib.pyplot as plt
+
+        solutions = np.asarray(kwargs.pop("solutions", range(len(self._sols))))
+        fig, ax = plt.subplots(figsize=self.figsize)
+        bbox = ax.get_window_extent()
+        nt, nx = kwargs.pop("max_size", (int(bbox.width), int(bbox.height)))
+        solutions = solutions[:: max(len(solutions) // nt, 1)]
+        step = max(len(self._sols[solutions[0]]["x"]) // nx, 1)
+        fx = abs(Length(1, self.model.domain.plot_unit))
+        ft = abs(Time(1, self.model.time_unit))
+        X = np.array([self._sols[s]["x"][::step] for s in solutions]) / fx
+        T = np.array([self._sols[s]["T"][::step] for s in solutions])
+        tm = np.array([self._sols[s]["time_abs"] for s in solutions]) / ft
+        tm = np.broadcast_to(tm[:, None], X.shape)
+        h = ax.pcolormesh(tm, X, T, shading="nearest")
+        ax.yaxis.set_inverted(True)
+        fig.colorbar(h, ax=ax, label="Temperature [°C]")
+        ax.set_xlabel(f"Time [{self.model.time_unit}]")
+        ax.set_ylabel(f"Depth [{self.model.domain.plot_unit}]")
+        plt.show()
+
+    def snapshot(self):
+        sol = dict(
+            time_abs=self.model._time_abs,
+            x=self.model.domain.x.copy(),
+            T=self.model.T.copy(),
         )
+        if self.model.S is not None:
+            sol["S"] = self.model.S.copy()
+        return sol
+
+    def uncertainty(self, covariance=None):
+        """Return standard deviation of temperature for each stored snapshot.
+
+        ``covariance`` of parameters is matrix or vector of variances, default
+        is ``covariance`` given to simulation.
+        """
+        C = np.atleast_1d(self.covariance if covariance is None else covariance)
+        C = np.diag(C) if C.ndim == 1 else C
+        return [
+            np.sqrt(np.sum((sol["S"] @ C) * sol["S"], axis=1)) for sol in self._sols
+        ]
+
+    def store(self):
+        sol = self.snapshot()
+        for key, value in sol.items():
+            if isinstance(value, np.ndarray) and value.dtype != self.store_dtype:
+                sol[key] = value.astype(self.store_dtype)
+                if key == "T":
+                    err = np.max(np.abs(sol[key] - value))
+                    rel = err / max(np.max(np.abs(value)), np.finfo(float).tiny)
+                    stats = self.storage_stats
+                    stats["max_abs_error"] = max(stats["max_abs_error"], err)
+                    stats["max_rel_error"] = max(stats["max_rel_error"], rel)
+        if self._provisional:
+            self._nbytes -= self._in_memory(self._sols.pop())
+            self._indices.pop()
+            self.storage_stats["decimated"] += 1
+            if self.tracers is not None:
+                for tracer in self.tracers:
+                    tracer._store_ix.pop()
+        self._sols.append(sol)
+        self._nbytes += self._in_memory(sol)
+        self._indices.append(self._count)
+        self._provisional = self._count % self._stride != 0
+        self._count += 1
         if self.tracers is not None:
             for tracer in self.tracers:
                 tracer.mark_current()
+        if self.memory_budget is not None:
+            self.enforce_budget()
+
+    @staticmethod
+    def _in_memory(sol):
+        return sum(
+            v.nbytes
+            for v in sol.values()
+            if isinstance(v, np.ndarray) and not isinstance(v, np.memmap)
+        )
+
+    def memory_usage(self):
+        """Return number of bytes of snapshots held in memory."""
+        return self._nbytes
+
+    def enforce_budget(self):
+        if self.overflow == "spill":
+            if self.spill_dir is None:
+                self.spill_dir = tempfile.mkdtemp(prefix="heatlib_")
+                self._cleanup = weakref.finalize(
+                    self, shutil.rmtree, self.spill_dir, ignore_errors=True
+                )
+            os.makedirs(self.spill_dir, exist_ok=True)
+            # spill oldest snapshots first, the current one stays in memory
+            while self._nbytes > self.memory_budget and (
+                self._spilled < len(self._sols) - 1
+            ):
+                i = self._spilled
+                sol = self._sols[i]
+                for key, value in sol.items():
+                    if isinstance(value, np.ndarray) and not isinstance(
+                        value, np.memmap
+                    ):
+                        name = f"{id(self)}_{i}_{key}.npy"
+                        path = os.path.join(self.spill_dir, name)
+                        np.save(path, value)
+                        sol[key] = np.load(path, mmap_mode="r")
+                        self._nbytes -= value.nbytes
+                        self.storage_stats["spilled"] += 1
+                self._spilled += 1
+        else:
+            # double the stride, first and last snapshots are always kept
+            while self._nbytes > self.memory_budget and len(self._sols) > 2:
+                self._stride *= 2
+                last = len(self._sols) - 1
+                keep = [
+                    i
+                    for i, ix in enumerate(self._indices)
+                    if ix % self._stride == 0 or i == last
+                ]
+                self.storage_stats["decimated"] += len(self._sols) - len(keep)
+                self._sols = [self._sols[i] for i in keep]
+                self._indices = [self._indices[i] for i in keep]
+                self._provisional = self._indices[-1] % self._stride != 0
+                self._nbytes = sum(self._in_memory(sol) for sol in self._sols)
+                if self.tracers is not None:
+                    for tracer in self.tracers:
+                        tracer._store_ix = [tracer._store_ix[i] for i in keep]
+
+    def close(self):
+        """Remove temporary spill directory, spilled snapshots are lost."""
+        if self._cleanup is not None:
+            self._cleanup()
+
+    def report(self):
+        stats = self.storage_stats
+        tracer_stats = {
+            key: max([t.storage_stats[key] for t in self.tracers or []], default=0.0)
+            for key in ("max_abs_error", "max_rel_error")
+        }
+        res = [
+            f"Snapshots: {len(self._sols)} stored as {self.store_dtype}",
+            f"Memory: {self.memory_usage()} bytes"
+            + (f" (budget {self.memory_budget})" if self.memory_budget else ""),
+            f"Max abs error of stored T: {stats['max_abs_error']:g}",
+            f"Max rel error of stored T: {stats['max_rel_error']:g}",
+            f"Max abs error of tracer T: {tracer_stats['max_abs_error']:g}",
+            f"Max rel error of tracer T: {tracer_stats['max_rel_error']:g}",
+            f"Decimated snapshots: {stats['decimated']}",
+            f"Spilled arrays: {stats['spilled']}",
+        ]
+        return "\n".join(res)
+
+    def iterate(self):
+        """Run simulation, yielding each stored snapshot."""
+        # Init solvers
+        for s in self.init_solvers:
+            s.solve(self.model, tracers=self.tracers)
+        self.store()
+        yield self._sols[-1]
         # main simulation loop
         for i in range(self.repeat):
             for s in self.sim_solvers:
                 s.solve(self.model, tracers=self.tracers)
-            self._sols.append(
-                dict(
-                    time_abs=self.model._time_abs,
-                    x=self.model.domain.x.copy(),
-                    T=self.model.T.copy(),
-                )
-            )
-            if self.tracers is not None:
-                for tracer in self.tracers:
-                    tracer.mark_current()
+            self.store()
+            yield self._sols[-1]
+
+    def run(self, live=False):
+        """Run simulation, optionally updating ``LivePlot`` after each snapshot."""
+        plot = LivePlot(self) if live else None
+        try:
+            for sol in self.iterate():
+                if plot is not None:
+                    plot.update(sol)
+        finally:
+            if plot is not None:
+                plot.close()
         print("Done.")
+
+
+class Simulation_2D(Simulation_1D):
+    solver_type = Solver_2D
+    tracer_type = Tracer_2D
+
+    def snapshot(self):
+        return dict(
+            time_abs=self.model._time_abs,
+            x=self.model.domain.x.copy(),
+            z=self.model.domain.z.copy(),
+            T=self.model.T.copy(),
+        )
+
+    def plot(self, **kwargs):
+        import matplotlib.pyplot as plt
+
+        solutions = kwargs.pop("solutions", [len(self._sols) - 1])
+        fig, axs = plt.subplots(
+            1, len(solutions), figsize=self.figsize, squeeze=False, sharey=True
+        )
+        f = abs(Length(1, self.model.domain.plot_unit))
+        for ax, sol in zip(axs[0], solutions):
+            T = self._sols[sol]["T"]
+            x = self._sols[sol]["x"] / f
+            z = self._sols[sol]["z"] / f
+            tm = self._sols[sol]["time_abs"] / abs(Time(1, self.model.time_unit))
+            h = ax.pcolormesh(x, z, T, shading="gouraud")
+            ax.set_aspect("equal")
+            ax.set_title(f"{tm:g} {self.model.time_unit}")
+            ax.set_xlabel(f"Distance [{self.model.domain.plot_unit}]")
+        axs[0, 0].yaxis.set_inverted(True)
+        axs[0, 0].set_ylabel(f"Depth [{self.model.domain.plot_unit}]")
+        fig.colorbar(h, ax=axs[0].tolist(), label="Temperature [°C]")
+        plt.show()
+
+    def plot_field(self, **kwargs):
+        raise NotImplementedError("Simulation_2D has no time-depth field plot.")
+
+    def uncertainty(self, covariance=None):
+        raise NotImplementedError("Simulation_2D does not propagate sensitivities.")
+
+    def run(self, live=False):
+        """Run simulation, live plotting is not supported for 2D."""
+        if live:
+            raise NotImplementedError("Simulation_2D does not support live plot.")
+        super().run()
@@ -1,16 +1,29 @@
+import os
+import weakref
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
-from scipy.sparse import spdiags
-from scipy.sparse.linalg import spsolve
+from scipy.sparse import coo_matrix, diags, spdiags, vstack
+from scipy.sparse.linalg import cg, splu, spsolve
 
 from heatlib.boundary_conditions import Dirichlet_BC
+from heatlib.kernels import Tridiagonal_Stepper, get_backend
 
 #################################################
 #            Solvers                            #
 #################################################
 
 
+def _same_key(cached, key):
+    # compare cache keys made of tuple of values and tuple of arrays
+    return (
+        cached[0] == key[0]
+        and len(cached[1]) == len(key[1])
+        and all(np.array_equal(a, b) for a, b in zip(cached[1], key[1]))
+    )
+
+
 class Solver_1D(ABC):
     def __init__(self, **kwargs):
         self.log = kwargs.get("log", False)
@@ -35,136 +48,612 @@ class SetTemperature_1D(Solver_1D):
     def solve(self, model, tracers=None):
         idx = (model.domain.x >= self.xmin) & (model.domain.x <= self.xmax)
         model.T[idx] = self.value
+        if model.S is not None:
+            model.S[idx] = 0
         super().tracers(model, tracers)
 
 
 class Deform_1D(Solver_1D):
+    """Instantaneous deformation of model domain.
+
+    ``factors`` could be scalar, array with one factor per element, array of
+    shape (steps, n_elements) with per-step factors or callable ``f(xm, t)``
+    returning factors for element midpoints ``xm`` at time ``t``. Time of
+    i-th step is ``model._time_abs + i * dt``. Deformation does not advance
+    model time.
+    """
+
     def __init__(self, **kwargs):
         self.factors = kwargs.get("factors", 1)
         self.steps = kwargs.get("steps", 1)
+        self.dt = abs(kwargs.get("dt", 0))
         super().__init__(**kwargs)
 
+    def total_factors(self, model):
+        dx = model.domain.dx
+        if callable(self.factors):
+            total = np.ones_like(dx)
+            for i in range(self.steps):
+                dxi = dx * total
+                xm = np.cumsum(dxi) - dxi / 2
+                factors = self.factors(xm, model._time_abs + i * self.dt)
+                assert np.all(factors > 0), "Deformation factors must be positive."
+                total *= factors
+            return total
+        factors = np.asarray(self.factors, dtype=float)
+        assert np.all(factors > 0), "Deformation factors must be positive."
+        if factors.ndim == 2:
+            assert (
+                factors.shape[0] == self.steps
+            ), "Per-step factors must have one row per step."
+            return np.prod(factors, axis=0) * np.ones_like(dx)
+        return factors**self.steps * np.ones_like(dx)
+
     def solve(self, model, tracers=None):
-        factors = np.atleast_1d(self.factors)
-        if len(factors) == 1:
-            factors = factors * np.ones_like(model.domain.elements)
-        for i in range(self.steps):
-            x_old = model.domain.x
-            for e, factor in zip(model.domain.elements, factors):
-                e.dx *= factor
-            if tracers is not None:
-                x_new = model.domain.x
-                for tracer in tracers:
-                    tracer._x = np.interp(tracer._x, x_old, x_new)
+        x_old = model.domain.x
+        model.domain.dx = model.domain.dx * self.total_factors(model)
+        if tracers is not None:
+            x_new = model.domain.x
+            tx = np.array([tracer._x for tracer in tracers], dtype=float)
+            tx = np.interp(tx, x_old, x_new)
+            for tracer, x in zip(tracers, tx):
+                tracer._x = x
         super().tracers(model, tracers)
 
 
 class SteadyState_1D(Solver_1D):
+    def system(self, model):
+        """Return matrix A and vector b of steady state system A T = b."""
+        kl, kr = model.domain.k[:-1], model.domain.k[1:]
+        Hl, Hr = model.domain.H[:-1], model.domain.H[1:]
+        dxl, dxr = model.domain.dx[:-1], model.domain.dx[1:]
+        alfa, beta = kl / dxl, kr / dxr
+        dl = np.hstack((alfa, 1, 0))
+        dm = np.hstack((1, -(alfa + beta), 1))
+        dr = np.hstack((0, 1, beta))
+        # Sparse coefficient matrix
+        A = spdiags([dl, dm, dr], [-1, 0, 1], model.domain.n, model.domain.n, "csr")
+        # Column vector of constant terms and BC
+        b = np.hstack((0, -(dxr * Hl + dxl * Hr) / 2, 0))
+        # Boundary conditions
+        if isinstance(model.bc0, Dirichlet_BC):
+            A[0, :2] = [1, 0]
+            b[0] = model.bc0.value
+        else:  # Neumann
+            A[0, :2] = [-2 * model.domain.k[0], 2 * model.domain.k[0]]
+            b[0] = (
+                -2 * model.bc0.value * model.domain.dx[0]
+                - model.domain.H[0] * model.domain.dx[0] ** 2
+            )
+
+        if isinstance(model.bc1, Dirichlet_BC):
+            A[-1, -2:] = [0, 1]
+            b[-1] = model.bc1.value
+        else:  # Neumann
+            A[-1, -2:] = [2 * model.domain.k[-1], -2 * model.domain.k[-1]]
+            b[-1] = (
+                2 * model.bc1.value * model.domain.dx[-1]
+                - model.domain.H[-1] * model.domain.dx[-1] ** 2
+            )
+        return A, b
+
     def solve(self, model, tracers=None):
         if model.bc0 is not None and model.bc1 is not None:
-            kl, kr = model.domain.k[:-1], model.domain.k[1:]
-            Hl, Hr = model.domain.H[:-1], model.domain.H[1:]
-            dxl, dxr = model.domain.dx[:-1], model.domain.dx[1:]
-            alfa, beta = kl / dxl, kr / dxr
-            dl = np.hstack((alfa, 1, 0))
-            dm = np.hstack((1, -(alfa + beta), 1))
-            dr = np.hstack((0, 1, beta))
-            # Sparse coefficient matrix
-            A = spdiags([dl, dm, dr], [-1, 0, 1], model.domain.n, model.domain.n, "csr")
-            # Column vector of constant terms and BC
-            b = np.hstack((0, -(dxr * Hl + dxl * Hr) / 2, 0))
-            # Boundary conditions
-            if isinstance(model.bc0, Dirichlet_BC):
-                A[0, :2] = [1, 0]
-                b[0] = model.bc0.value
-            else:  # Neumann
-                A[0, :2] = [-2 * model.domain.k[0], 2 * model.domain.k[0]]
-                b[0] = (
-                    -2 * model.bc0.value * model.domain.dx[0]
-                    - model.domain.H[0] * model.domain.dx[0] ** 2
-                )
-
-            if isinstance(model.bc1, Dirichlet_BC):
-                A[-1, -2:] = [0, 1]
-                b[-1] = model.bc1.value
-            else:  # Neumann
-                A[-1, -2:] = [2 * model.domain.k[-1], -2 * model.domain.k[-1]]
-                b[-1] = (
-                    2 * model.bc1.value * model.domain.dx[-1]
-                    - model.domain.H[-1] * model.domain.dx[-1] ** 2
-                )
+            A, b = self.system(model)
             # solution
             model.T = spsolve(A, b)
+            if model.parameters is not None:
+                # sensitivities A S = db - dA T for all parameters at once
+                derivs = model.parameters.derivatives(self.system)
+                dA = vstack([d[0] for d in derivs])
+                R = np.column_stack([d[1] for d in derivs])
+                R -= (dA @ model.T).reshape(len(derivs), -1).T
+                model.S = splu(A.tocsc()).solve(R)
             model._time_abs = 0.0
+            model.sample_probes()
             super().tracers(model, tracers, init=True)
 
 
 class BTCS_1D(Solver_1D):
+    """Implicit backward time, centered space time stepping.
+
+    Assembled system, its factorization and work buffers are reused by
+    subsequent ``solve`` calls while the model, element properties, boundary
+    conditions, time step and backend do not change. Except for
+    ``"reference"`` backend, ``model.T`` is advanced in place in array owned
+    by the solver, so copy it to keep previous state.
+    """
+
     def __init__(self, **kwargs):
         self.dt = abs(kwargs.get("dt", 1))
         self.steps = kwargs.get("steps", 1)
+        self.backend = kwargs.get("backend", None)  # see heatlib.kernels
         super().__init__(**kwargs)
+        self._cache = None
+
+    def system(self, model, dt=None):
+        """Return matrix A, vector b and weights m of BTCS step A T' = b + m T."""
+        dt = self.dt if dt is None else dt
+        kl, kr = model.domain.k[:-1], model.domain.k[1:]
+        Hl, Hr = model.domain.H[:-1], model.domain.H[1:]
+        dxl, dxr = model.domain.dx[:-1], model.domain.dx[1:]
+        rl, rr = model.domain.rho[:-1], model.domain.rho[1:]
+        cl, cr = model.domain.c[:-1], model.domain.c[1:]
+        alfa = kl * (1 + dxr / dxl)
+        beta = kr * (1 + dxl / dxr)
+        gama = (
+            cl * rl * dxr**2 + dxl * dxr * (cl * rr + cr * rl) + cr * rr * dxl**2
+        ) / (2 * dt)
+        delta = (Hl * dxr**2 + dxl * dxr * (Hl + Hr) + Hr * dxl**2) / 2
+        # Sparse coefficient matrix and column vector
+        dl = np.hstack((-alfa, 1, 0))
+        dm = np.hstack((1, alfa + beta + gama, 1))
+        dr = np.hstack((0, 1, -beta))
+        # Sparse coefficient matrix A
+        A = spdiags([dl, dm, dr], [-1, 0, 1], model.domain.n, model.domain.n, "csr")
+        # Column vector of constant terms
+        b = np.hstack((0, delta, 0))
+        # Boundary conditions
+        if isinstance(model.bc0, Dirichlet_BC):
+            A[0, :2] = [1, 0]
+            b[0] = model.bc0.value
+            gamma_b0 = 0
+        else:  # Neumann
+            gamma_b0 = (
+                model.domain.c[0]
+                * model.domain.rho[0]
+                * model.domain.dx[0] ** 2
+                / dt
+            )
+            A[0, :2] = [gamma_b0 + 2 * model.domain.k[0], -2 * model.domain.k[0]]
+            b[0] = (
+                -model.domain.H[0] * model.domain.dx[0] ** 2
+                + 2 * model.domain.dx[0] * model.bc0.value
+            )
+        if isinstance(model.bc1, Dirichlet_BC):
+            A[-1, -2:] = [0, 1]
+            b[-1] = model.bc1.value
+            gamma_b1 = 0
+        else:  # Neumann
+            gamma_b1 = (
+                model.domain.c[-1]
+                * model.domain.rho[-1]
+                * model.domain.dx[-1] ** 2
+                / dt
+            )
+            A[-1, -2:] = [
+                -2 * model.domain.k[-1],
+                gamma_b1 + 2 * model.domain.k[-1],
+            ]
+            b[-1] = (
+                -model.domain.H[-1] * model.domain.dx[-1] ** 2
+                - 2 * model.domain.dx[-1] * model.bc1.value
+            )
+        m = np.hstack((gamma_b0, gama, gamma_b1))
+        return A, b, m
+
+    def _key(self, model):
+        # everything the assembled system depends on, element properties
+        # could be edited in place, so their arrays are compared
+        dom = model.domain
+        values = (
+            type(model.bc0),
+            model.bc0.value,
+            type(model.bc1),
+            model.bc1.value,
+            self.dt,
+        )
+        return values, (dom.dx.copy(), dom.k, dom.H, dom.rho, dom.c)
+
+    def _prepare(self, model):
+        # cached system, stepper, temperature buffer and sensitivity system
+        backend = get_backend(self.backend)
+        values, arrays = self._key(model)
+        key = (values + (backend,), arrays)
+        if self._cache is None or self._cache[0] is not model or (
+            not _same_key(self._cache[1], key)
+        ):
+            A, b, m = self.system(model)
+            if backend == "reference":
+                stepper = None
+            else:
+                stepper = Tridiagonal_Stepper(A, b, m, backend)
+            self._cache = (
+                model,
+                key,
+                (A, b, m),
+                stepper,
+                np.empty(model.domain.n),
+                {},
+            )
+        return self._cache[2:]
 
     def solve(self, model, tracers=None):
         if model.T is not None:
-            kl, kr = model.domain.k[:-1], model.domain.k[1:]
-            Hl, Hr = model.domain.H[:-1], model.domain.H[1:]
-            dxl, dxr = model.domain.dx[:-1], model.domain.dx[1:]
-            rl, rr = model.domain.rho[:-1], model.domain.rho[1:]
-            cl, cr = model.domain.c[:-1], model.domain.c[1:]
-            alfa = kl * (1 + dxr / dxl)
-            beta = kr * (1 + dxl / dxr)
-            gama = (
-                cl * rl * dxr**2 + dxl * dxr * (cl * rr + cr * rl) + cr * rr * dxl**2
-            ) / (2 * self.dt)
-            delta = (Hl * dxr**2 + dxl * dxr * (Hl + Hr) + Hr * dxl**2) / 2
-            # Sparse coefficient matrix and column vector
-            dl = np.hstack((-alfa, 1, 0))
-            dm = np.hstack((1, alfa + beta + gama, 1))
-            dr = np.hstack((0, 1, -beta))
-            # Sparse coefficient matrix A
-            A = spdiags([dl, dm, dr], [-1, 0, 1], model.domain.n, model.domain.n, "csr")
-            # Column vector of constant terms
-            b = np.hstack((0, delta, 0))
-            # Boundary conditions
-            if isinstance(model.bc0, Dirichlet_BC):
-                A[0, :2] = [1, 0]
-                b[0] = model.bc0.value
-                gamma_b0 = 0
-            else:  # Neumann
-                gamma_b0 = (
-                    model.domain.c[0]
-                    * model.domain.rho[0]
-                    * model.domain.dx[0] ** 2
-                    / self.dt
-                )
-                A[0, :2] = [gamma_b0 + 2 * model.domain.k[0], -2 * model.domain.k[0]]
-                b[0] = (
-                    -model.domain.H[0] * model.domain.dx[0] ** 2
-                    + 2 * model.domain.dx[0] * model.bc0.value
-                )
-            if isinstance(model.bc1, Dirichlet_BC):
-                A[-1, -2:] = [0, 1]
-                b[-1] = model.bc1.value
-                gamma_b1 = 0
-            else:  # Neumann
-                gamma_b1 = (
-                    model.domain.c[-1]
-                    * model.domain.rho[-1]
-                    * model.domain.dx[-1] ** 2
-                    / self.dt
-                )
-                A[-1, -2:] = [
-                    -2 * model.domain.k[-1],
-                    gamma_b1 + 2 * model.domain.k[-1],
+            (A, b, m), stepper, T, sens = self._prepare(model)
+            if model.parameters is not None:
+                self.solve_sensitivities(model, A, b, m, sens)
+            else:
+                if stepper is None:
+                    # Calculate solution of next time step(s)
+                    for i in range(self.steps):
+                        model.T = spsolve(A, b + m * model.T)
+                        model._time_abs += self.dt
+                        model.sample_probes()
+                else:
+                    if model.T is not T:
+                        T[:] = model.T
+                        model.T = T
+                    if not model.probes:
+                        stepper.step(T, self.steps)
+                    for i in range(self.steps):
+                        if model.probes:
+                            stepper.step(T)
+                        model._time_abs += self.dt
+                        model.sample_probes()
+            super().tracers(model, tracers)
+
+    def solve_sensitivities(self, model, A, b, m, cache=None):
+        # A S' = m S + db + dm T - dA T' solved as one multi-RHS system per step,
+        # factorization and derivatives are kept in cache for the same system
+        cache = {} if cache is None else cache
+        if cache.get("parameters") is not model.parameters:
+            derivs = model.parameters.derivatives(self.system)
+            cache.update(
+                parameters=model.parameters,
+                lu=splu(A.tocsc()),
+                dA=vstack([d[0] for d in derivs]),
+                db=np.column_stack([d[1] for d in derivs]),
+                dm=np.column_stack([d[2] for d in derivs]),
+            )
+        lu, dA, db, dm = cache["lu"], cache["dA"], cache["db"], cache["dm"]
+        p = db.shape[1]
+        if model.S is None:
+            model.S = np.zeros((model.domain.n, p))
+        for i in range(self.steps):
+            T = model.T
+            model.T = lu.solve(b + m * T)
+            R = db + dm * T[:, None] + m[:, None] * model.S
+            R -= (dA @ model.T).reshape(p, -1).T
+            model.S = lu.solve(R)
+            model._time_abs += self.dt
+            model.sample_probes()
+
+
+def _propagate(system, T, steps):
+    # BTCS propagator with factorized system (lu, b, m)
+    lu, b, m = system
+    for i in range(steps):
+        T = lu.solve(b + m * T)
+    return T
+
+
+_fine = None  # fine system factorized in Parareal_1D worker process
+
+
+def _init_fine(A, b, m):
+    # Parareal_1D worker initializer
+    global _fine
+    _fine = (splu(A.tocsc()), b, m)
+
+
+def _fine_propagate(T, steps):
+    return _propagate(_fine, T, steps)
+
+
+class Parareal_1D(BTCS_1D):
+    """Parallel-in-time BTCS solution with parareal iterations.
+
+    Total ``steps`` fine steps of length ``dt`` are split into ``slices``
+    time slices. Coarse propagator makes ``coarse_steps`` BTCS steps per
+    slice, fine propagators run concurrently on ``workers`` processes.
+    Iterations stop when maximum change of slice boundary temperatures is
+    below ``tol`` or after ``max_iter`` iterations. In the worst case it
+    converges to serial fine solution after ``slices`` iterations.
+
+    Worker processes keep fine factorization and are reused by subsequent
+    ``solve`` calls while the system does not change. They are shut down
+    by ``close`` or when the solver is deleted.
+    """
+
+    def __init__(self, **kwargs):
+        self.slices = kwargs.get("slices", os.cpu_count())
+        self.coarse_steps = kwargs.get("coarse_steps", 1)
+        self.tol = kwargs.get("tol", 1e-6)
+        self.max_iter = kwargs.get("max_iter", None)
+        self.workers = kwargs.get("workers", None)
+        super().__init__(**kwargs)
+        self.iterations = 0
+        self.residuals = []
+        self._pool = None
+        self._shutdown = None
+        self._coarse = {}
+
+    def _prepare(self, model):
+        # worker pool with fine factorization and coarse factorizations
+        key = self._key(model)
+        if self._pool is None or not _same_key(self._cache, key):
+            self.close()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_fine,
+                initargs=self.system(model),
+            )
+            self._shutdown = weakref.finalize(self, self._pool.shutdown)
+            self._cache = key
+            self._coarse = {}
+        return self._pool
+
+    def _coarse_system(self, model, n):
+        dt = n * self.dt / self.coarse_steps
+        if dt not in self._coarse:
+            A, b, m = self.system(model, dt)
+            self._coarse[dt] = (splu(A.tocsc()), b, m)
+        return self._coarse[dt]
+
+    def close(self):
+        """Shut down worker processes."""
+        if self._shutdown is not None:
+            self._shutdown()
+        self._pool = None
+        self._shutdown = None
+
+    def solve(self, model, tracers=None):
+        assert (
+            getattr(model, "parameters", None) is None
+        ), "Parareal_1D does not propagate sensitivities."
+        assert not model.probes, "Parareal_1D does not sample probes every step."
+        if model.T is not None:
+            pool = self._prepare(model)
+            nslices = min(self.slices, self.steps)
+            fine_steps = np.diff(np.linspace(0, self.steps, nslices + 1).astype(int))
+
+            def G(n, T):
+                coarse = self._coarse_system(model, fine_steps[n])
+                return _propagate(coarse, T, self.coarse_steps)
+
+            U = [np.array(model.T, dtype=float)]
+            for n in range(nslices):
+                U.append(G(n, U[n]))
+            G_old = U[1:]
+            max_iter = nslices if self.max_iter is None else self.max_iter
+            self.residuals = []
+            for k in range(max_iter):
+                # slices before k are already exact
+                futures = [
+                    pool.submit(_fine_propagate, U[n], fine_steps[n])
+                    for n in range(k, nslices)
                 ]
-                b[-1] = (
-                    -model.domain.H[-1] * model.domain.dx[-1] ** 2
-                    - 2 * model.domain.dx[-1] * model.bc1.value
-                )
-            # Calculate solution of next time step(s)
-            m = np.hstack((gamma_b0, gama, gamma_b1))
+                F = [f.result() for f in futures]
+                U_new = U[: k + 1]
+                G_new = G_old[:k]
+                for n in range(k, nslices):
+                    g = G(n, U_new[n])
+                    U_new.append(g + F[n - k] - G_old[n])
+                    G_new.append(g)
+                res = max(np.max(abs(a - b)) for a, b in zip(U_new, U))
+                self.residuals.append(res)
+                U, G_old = U_new, G_new
+                if res < self.tol:
+                    break
+            self.iterations = len(self.residuals)
+            model.T = U[-1]
+            model._time_abs += self.steps * self.dt
+            super().tracers(model, tracers)
+
+
+class Solver_2D(ABC):
+    """Base class of solvers acting on ``Model_2D``.
+
+    Implicit solvers assemble node based finite volume system on the
+    rectilinear grid. ``method`` keyword argument selects ``"direct"`` sparse
+    LU factorization, which is reused while the domain, its geometry and
+    properties, boundary condition types and time step do not change, or
+    ``"cg"`` Jacobi preconditioned conjugate gradients with relative tolerance
+    ``tol`` suitable for very large grids. Default ``"auto"`` switches to
+    ``"cg"`` above ``direct_limit`` nodes. ``RuntimeError`` is raised when
+    conjugate gradients do not converge.
+    """
+
+    def __init__(self, **kwargs):
+        self.log = kwargs.get("log", False)
+        self.method = kwargs.get("method", "auto")
+        self.tol = kwargs.get("tol", 1e-10)
+        self.direct_limit = kwargs.get("direct_limit", 2000000)
+        self._cache = None
+
+    @abstractmethod
+    def solve(self, model, tracers=None):
+        pass
+
+    def tracers(self, model, tracers, init=False):
+        if tracers is not None and self.log:
+            for tracer in tracers:
+                tracer.record(model, type(self).__name__, init)
+
+    @staticmethod
+    def _node_sum(values):
+        # distribute cell quarters to surrounding nodes
+        nz, nx = values.shape
+        res = np.zeros((nz + 1, nx + 1))
+        res[:-1, :-1] += values
+        res[:-1, 1:] += values
+        res[1:, :-1] += values
+        res[1:, 1:] += values
+        return res
+
+    @staticmethod
+    def _edge_length(d):
+        res = np.zeros(len(d) + 1)
+        res[:-1] += d / 2
+        res[1:] += d / 2
+        return res
+
+    def assemble(self, model):
+        """Return conductance matrix, node heat capacity and node source terms."""
+        dom = model.domain
+        nz, nx = dom.k.shape
+        idx = np.arange(dom.n).reshape(dom.shape)
+        # horizontal and vertical conductances between neighbouring nodes
+        kdz = dom.k * dom.dz[:, None] / 2
+        Gx = (np.vstack((np.zeros(nx), kdz)) + np.vstack((kdz, np.zeros(nx)))) / dom.dx
+        kdx = dom.k * dom.dx / 2
+        Gz = (
+            np.hstack((np.zeros((nz, 1)), kdx)) + np.hstack((kdx, np.zeros((nz, 1))))
+        ) / dom.dz[:, None]
+        i = np.hstack((idx[:, :-1].ravel(), idx[:-1, :].ravel()))
+        j = np.hstack((idx[:, 1:].ravel(), idx[1:, :].ravel()))
+        g = np.hstack((Gx.ravel(), Gz.ravel()))
+        K = coo_matrix(
+            (np.hstack((-g, -g)), (np.hstack((i, j)), np.hstack((j, i)))),
+            shape=(dom.n, dom.n),
+        ).tocsr()
+        K = K - diags(np.asarray(K.sum(axis=1)).ravel())
+        area = dom.dz[:, None] * dom.dx / 4
+        C = self._node_sum(dom.rho * dom.c * area)
+        S = self._node_sum(dom.H * area)
+        return K, C, S
+
+    def neumann(self, model):
+        """Return node heat inflow due to Neumann boundary conditions."""
+        dom = model.domain
+        Q = np.zeros(dom.shape)
+        Lx, Lz = self._edge_length(dom.dx), self._edge_length(dom.dz)
+        for bc, sl, length in (
+            (model.bc0, np.s_[0, :], Lx),
+            (model.bc1, np.s_[-1, :], -Lx),
+            (model.bcl, np.s_[:, 0], Lz),
+            (model.bcr, np.s_[:, -1], -Lz),
+        ):
+            if not isinstance(bc, Dirichlet_BC):
+                Q[sl] += bc.value * length
+        return Q.ravel()
+
+    @staticmethod
+    def dirichlet(model):
+        """Return mask of Dirichlet nodes and their prescribed values."""
+        fixed = np.zeros(model.domain.shape, dtype=bool)
+        values = np.zeros(model.domain.shape)
+        # top and bottom take precedence in corners
+        for bc, sl in (
+            (model.bcl, np.s_[:, 0]),
+            (model.bcr, np.s_[:, -1]),
+            (model.bc0, np.s_[0, :]),
+            (model.bc1, np.s_[-1, :]),
+        ):
+            if isinstance(bc, Dirichlet_BC):
+                fixed[sl] = True
+                values[sl] = bc.value
+        return fixed.ravel(), values.ravel()
+
+    def _system(self, model, dt=None):
+        # cached system is reused only for the same domain with unchanged
+        # geometry and properties, properties could be edited in place
+        dom = model.domain
+        bcs = tuple(type(bc) for bc in (model.bc0, model.bc1, model.bcl, model.bcr))
+        props = (dom.dx, dom.dz, dom.k, dom.H, dom.rho, dom.c)
+        cache = self._cache
+        if (
+            cache is None
+            or cache["domain"] is not dom
+            or cache["bcs"] != bcs
+            or cache["dt"] != dt
+            or not all(np.array_equal(a, b) for a, b in zip(cache["props"], props))
+        ):
+            K, C, S = self.assemble(model)
+            fixed, _ = self.dirichlet(model)
+            assert fixed.any(), "At least one Dirichlet boundary condition needed."
+            m = C.ravel() / dt if dt is not None else np.zeros(dom.n)
+            A = (K + diags(m)).tocsr()
+            free = ~fixed
+            A_ff = A[free][:, free].tocsc()
+            method = self.method
+            if method == "auto":
+                method = "direct" if dom.n <= self.direct_limit else "cg"
+            self._cache = dict(
+                domain=dom,
+                bcs=bcs,
+                dt=dt,
+                props=tuple(p.copy() for p in props),
+                S=S.ravel(),
+                m=m,
+                free=free,
+                A_fd=A[free][:, fixed],
+                A_ff=A_ff,
+                method=method,
+                lu=(
+                    splu(
+                        A_ff,
+                        permc_spec="MMD_AT_PLUS_A",
+                        options=dict(SymmetricMode=True),
+                    )
+                    if method == "direct"
+                    else None
+                ),
+                M=diags(1 / A_ff.diagonal()) if method == "cg" else None,
+            )
+        return self._cache
+
+    def _linsolve(self, system, b, x0=None):
+        if system["method"] == "direct":
+            return system["lu"].solve(b)
+        x, info = cg(system["A_ff"], b, x0=x0, rtol=self.tol, M=system["M"])
+        if info != 0:
+            raise RuntimeError(
+                f"Conjugate gradients did not converge (info={info})."
+            )
+        return x
+
+    def _step(self, model, system, T_old):
+        # boundary values only enter right hand side, so they could change
+        # without invalidating cached system
+        fixed, values = self.dirichlet(model)
+        free = system["free"]
+        S = system["S"] + self.neumann(model)
+        b = S[free] + system["m"][free] * T_old[free] - system["A_fd"] @ values[fixed]
+        T = values.copy()
+        T[free] = self._linsolve(system, b, x0=T_old[free])
+        return T
+
+
+class SetTemperature_2D(Solver_2D):
+    def __init__(self, **kwargs):
+        self.xmin = abs(kwargs.get("xmin", 0))
+        self.xmax = abs(kwargs.get("xmax", np.inf))
+        self.zmin = abs(kwargs.get("zmin", 0))
+        self.zmax = abs(kwargs.get("zmax", np.inf))
+        self.value = kwargs.get("value", 0)
+        super().__init__(**kwargs)
+
+    def solve(self, model, tracers=None):
+        ix = (model.domain.x >= self.xmin) & (model.domain.x <= self.xmax)
+        iz = (model.domain.z >= self.zmin) & (model.domain.z <= self.zmax)
+        model.T[np.ix_(iz, ix)] = self.value
+        super().tracers(model, tracers)
+
+
+class SteadyState_2D(Solver_2D):
+    def solve(self, model, tracers=None):
+        if model.bc0 is not None and model.bc1 is not None:
+            system = self._system(model)
+            T_old = np.zeros(model.domain.n) if model.T is None else model.T.ravel()
+            model.T = self._step(model, system, T_old).reshape(model.domain.shape)
+            model._time_abs = 0.0
+            super().tracers(model, tracers, init=True)
+
+
+class BTCS_2D(Solver_2D):
+    def __init__(self, **kwargs):
+        self.dt = abs(kwargs.get("dt", 1))
+        self.steps = kwargs.get("steps", 1)
+        super().__init__(**kwargs)
+
+    def solve(self, model, tracers=None):
+        if model.T is not None:
+            system = self._system(model, self.dt)
+            T = model.T.ravel()
             for i in range(self.steps):
-                model.T = spsolve(A, b + m * model.T)
+                T = self._step(model, system, T)
                 model._time_abs += self.dt
+            model.T = T.reshape(model.domain.shape)
             super().tracers(model, tracers)
@@ -1,18 +1,35 @@
+from array import array
+
 import numpy as np
 
+from heatlib.domains import interpolation_weights
 from heatlib.units import Length, Time
 
 #################################################
 #            Tracer                             #
 #################################################
 
+# dtypes supported by typed array histories
+HISTORY_DTYPES = ('float32', 'float64')
+
+
+def _history_dtype(dtype):
+    dtype = np.dtype(dtype)
+    assert (
+        dtype.name in HISTORY_DTYPES
+    ), f'Tracer histories support only {", ".join(HISTORY_DTYPES)} dtypes.'
+    return dtype
+
 
 class Tracer_1D:
     def __init__(self, name, x, **kwargs):
         self.name = name
         self._x = abs(x)
         self._T = None
-        self.store = dict(T=[], x=[], time_abs=[])
+        # T and x storage dtype
+        self.dtype = _history_dtype(kwargs.get('dtype', np.float64))
+        self.store = self._new_store()
+        self.storage_stats = dict(max_abs_error=0.0, max_rel_error=0.0)
         self.log = []
         self._store_ix = []
         self.plot_unit = kwargs.get('plot_unit', 'm')  # plotting spatial unit
@@ -21,20 +38,55 @@ class Tracer_1D:
     def __repr__(self):
         return f'Tracer {self.name}: x={self._x} T={self._T}'
 
+    def _new_store(self):
+        # compact typed histories, time is always kept in double precision
+        return dict(
+            T=array(self.dtype.char),
+            x=array(self.dtype.char),
+            time_abs=array('d'),
+        )
+
+    def _sample(self, model):
+        res = dict(T=model.get_T(self._x), x=self._x)
+        if getattr(model, 'S', None) is not None:
+            res['S'] = model.get_S(self._x)
+        return res
+
+    def set_dtype(self, dtype):
+        self.dtype = _history_dtype(dtype)
+        store = self._new_store()
+        for key, values in self.store.items():
+            store.setdefault(key, array(self.dtype.char)).extend(values.tolist())
+        self._storage_error(self.store['T'])
+        self.store = store
+
+    def _storage_error(self, values):
+        # precision lost by storing double precision temperatures
+        values = np.asarray(values, dtype=float)
+        err = np.max(np.abs(values.astype(self.dtype) - values), initial=0)
+        rel = err / max(np.max(np.abs(values), initial=0), np.finfo(float).tiny)
+        stats = self.storage_stats
+        stats['max_abs_error'] = max(stats['max_abs_error'], err)
+        stats['max_rel_error'] = max(stats['max_rel_error'], rel)
+
     def record(self, model, log, init=False):
         if self._x >= 0:
+            values = self._sample(model)
+            self._T = values['T']
             if init:
-                self._T = model.get_T(self._x)
-                self.store['T'] = [self._T]
-                self.store['x'] = [self._x]
-                self.store['time_abs'] = [0]
-                self.log = [log]
-            else:
-                self._T = model.get_T(self._x)
-                self.store['T'].append(self._T)
-                self.store['x'].append(self._x)
-                self.store['time_abs'].append(model._time_abs)
-                self.log.append(log)
+                self.store = self._new_store()
+                self.storage_stats = dict(max_abs_error=0.0, max_rel_error=0.0)
+                self.log = []
+            values['time_abs'] = 0 if init else model._time_abs
+            self._storage_error(values['T'])
+            for key, value in values.items():
+                if key not in self.store:
+                    self.store[key] = array(self.dtype.char)
+                if np.ndim(value):
+                    self.store[key].extend(value.tolist())
+                else:
+                    self.store[key].append(value)
+            self.log.append(log)
 
     def mark_current(self):
         self._store_ix.append(len(self.store['time_abs']) - 1)
@@ -42,7 +94,7 @@ class Tracer_1D:
     @property
     def x_all(self):
         f = abs(Length(1, self.plot_unit))
-        return np.array([x / f for x in self.store['x']])
+        return np.asarray(self.store['x']) / f
 
     @property
     def x(self):
@@ -56,11 +108,108 @@ class Tracer_1D:
     def T(self):
         return self.T_all[self._store_ix]
 
+    @property
+    def S_all(self):
+        return np.asarray(self.store['S']).reshape(len(self.store['time_abs']), -1)
+
+    @property
+    def S(self):
+        return self.S_all[self._store_ix]
+
+    def std(self, covariance):
+        """Return standard deviation of marked temperatures."""
+        C = np.atleast_1d(covariance)
+        C = np.diag(C) if C.ndim == 1 else C
+        return np.sqrt(np.sum((self.S @ C) * self.S, axis=1))
+
     @property
     def time_all(self):
         f = abs(Time(1, self.time_unit))
-        return np.array([t / f for t in self.store['time_abs']])
+        return np.asarray(self.store['time_abs']) / f
 
     @property
     def time(self):
         return self.time_all[self._store_ix]
+
+
+class Tracer_2D(Tracer_1D):
+    def __init__(self, name, x, z, **kwargs):
+        self._z = abs(z)
+        super().__init__(name, x, **kwargs)
+
+    def __repr__(self):
+        return f'Tracer {self.name}: x={self._x} z={self._z} T={self._T}'
+
+    def _new_store(self):
+        store = super()._new_store()
+        store['z'] = array(self.dtype.char)
+        return store
+
+    def _sample(self, model):
+        return dict(T=model.get_T(self._x, self._z), x=self._x, z=self._z)
+
+    @property
+    def z_all(self):
+        f = abs(Length(1, self.plot_unit))
+        return np.asarray(self.store['z']) / f
+
+    @property
+    def z(self):
+        return self.z_all[self._store_ix]
+
+
+class Probe_1D:
+    """Set of fixed (Eulerian) depths sampled after every time step.
+
+    Interpolation weights are computed once and refreshed only when domain
+    geometry changes. Samples are kept in compact (n_samples, n_probes)
+    array of ``dtype``.
+    """
+
+    def __init__(self, name, x, **kwargs):
+        self.name = name
+        self._x = np.abs(np.atleast_1d(np.asarray(x, dtype=float)))
+        self.dtype = np.dtype(kwargs.get('dtype', np.float64))
+        self.plot_unit = kwargs.get('plot_unit', 'm')  # plotting spatial unit
+        self.time_unit = kwargs.get('time_unit', 's')  # default plotting time units
+        capacity = kwargs.get('capacity', 1024)
+        self._T = np.empty((capacity, len(self._x)), dtype=self.dtype)
+        self._time_abs = np.empty(capacity)
+        self._n = 0
+        self._cache = None
+
+    def __repr__(self):
+        return f'Probe {self.name}: {len(self._x)} depths, {self._n} samples'
+
+    def weights(self, domain):
+        if self._cache is None or self._cache[0] is not domain or (
+            self._cache[1] != domain._version
+        ):
+            j, w = interpolation_weights(self._x, domain.x)
+            self._cache = (domain, domain._version, j, w)
+        return self._cache[2:]
+
+    def sample(self, model):
+        j, w = self.weights(model.domain)
+        if self._n == len(self._time_abs):
+            self._T = np.concatenate((self._T, np.empty_like(self._T)))
+            self._time_abs = np.concatenate((self._time_abs, self._time_abs))
+        T = model.T
+        self._T[self._n] = T[j] + w * (T[j + 1] - T[j])
+        self._time_abs[self._n] = model._time_abs
+        self._n += 1
+
+    def clear(self):
+        self._n = 0
+
+    @property
+    def x(self):
+        return self._x / abs(Length(1, self.plot_unit))
+
+    @property
+    def T(self):
+        return self._T[: self._n]
+
+    @property
+    def time(self):
+        return self._time_abs[: self._n] / abs(Time(1, self.time_unit))
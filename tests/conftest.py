@@ -0,0 +1,4 @@
+import os
+
+# plots in tests are drawn without display
+os.environ.setdefault("MPLBACKEND", "Agg")
@@ -2,19 +2,34 @@
 
 """Tests for `heatlib` package."""
 
+from pathlib import Path
+
+import numpy as np
 import pytest
 
 from heatlib import (
     BTCS_1D,
+    BTCS_2D,
+    Deform_1D,
     Dirichlet_BC,
     Domain_1D,
+    Domain_2D,
     Element,
+    Inversion_1D,
     Model_1D,
+    Model_2D,
     Neumann_BC,
+    Parareal_1D,
+    Probe_1D,
     SetTemperature_1D,
+    SetTemperature_2D,
     Simulation_1D,
+    Simulation_2D,
     SteadyState_1D,
+    SteadyState_2D,
     Time,
+    Tracer_1D,
+    Tracer_2D,
 )
 
 
@@ -77,7 +92,451 @@ def test_btcs_solver(model, steady, intrusion, repeated_step):
     assert model.get_T(12500) == pytest.approx(689.50185908)
 
 
+def test_parareal_solver(model, steady, intrusion, repeated_step):
+    parareal = Parareal_1D(dt=Time("1000", "year"), steps=20, slices=4, workers=2)
+    model.solve(steady)
+    model.solve(intrusion)
+    T0 = model.T.copy()
+    model.solve(parareal)
+    assert parareal.iterations == 4
+    assert model.get_T(12500) == pytest.approx(689.50185908)
+    assert model.time == pytest.approx(20000)
+    # early stop with loose tolerance, worker pool is reused
+    pool = parareal._pool
+    parareal.tol = 1
+    model.T = T0.copy()
+    model.solve(parareal)
+    assert parareal._pool is pool
+    assert parareal.iterations < 4
+    assert parareal.residuals[-1] < 1 < parareal.residuals[0]
+    parareal.close()
+    T = model.T.copy()
+    model.T = T0.copy()
+    model.solve(repeated_step)
+    assert np.max(np.abs(T - model.T)) < 0.1
+
+
+@pytest.mark.parametrize("backend", ["numpy", "numba"])
+def test_btcs_backends(model, steady, intrusion, backend):
+    if backend == "numba":
+        pytest.importorskip("numba")
+    model.solve(steady)
+    model.solve(intrusion)
+    T0 = model.T.copy()
+    model.solve(BTCS_1D(dt=Time("1000", "year"), steps=20, backend="reference"))
+    reference = model.T
+    model.T = T0.copy()
+    model.solve(BTCS_1D(dt=Time("1000", "year"), steps=20, backend=backend))
+    assert model.T == pytest.approx(reference, rel=1e-12, abs=1e-9)
+
+
+def test_btcs_cache(model, steady):
+    def run(backend, solver=None):
+        model.bc1.value = -0.032
+        for e in model.domain.elements:
+            e.k = 2.5
+        model.solve(steady)
+        for q in [-0.032, -0.032, -0.05]:
+            model.bc1.value = q
+            step = solver or BTCS_1D(dt=Time("1000", "year"), backend=backend)
+            model.solve(step)
+        for e in model.domain.elements:
+            e.k = 10
+        model.solve(solver or BTCS_1D(dt=Time("1000", "year"), backend=backend))
+        return model.T.copy()
+
+    reference = run("reference")
+    assert run(None, BTCS_1D(dt=Time("1000", "year"))) == pytest.approx(reference)
+
+
 def test_simulation(model, steady, intrusion, single_step):
     s = Simulation_1D(model, [steady, intrusion], [single_step], repeat=20)
     s.run()
     assert s.model.get_T(12500) == pytest.approx(689.50185908)
+
+
+def test_simulation_precision(model, steady, intrusion, single_step):
+    tracer = Tracer_1D("t", 12500)
+    single_step.log = True
+    s = Simulation_1D(
+        model,
+        [steady, intrusion],
+        [single_step],
+        tracers=tracer,
+        repeat=20,
+        store_dtype="float32",
+        memory_budget=8 * 351 * 4,
+    )
+    s.run()
+    assert s.model.T.dtype == np.float64
+    assert s._sols[-1]["T"].dtype == np.float32
+    assert s.memory_usage() <= 8 * 351 * 4
+    assert len(s._sols) == len(tracer.T) < 21
+    assert s.time_steps()[-1] == pytest.approx(20000)
+    assert tracer.T[-1] == pytest.approx(689.50185908, rel=1e-6)
+    assert 0 < s.storage_stats["max_rel_error"] < 1e-6
+    assert s.storage_stats["decimated"] > 0
+    assert 0 < tracer.storage_stats["max_rel_error"] < 1e-6
+    assert "tracer T" in s.report()
+    with pytest.raises(AssertionError):
+        Simulation_1D(model, steady, single_step, tracers=tracer, store_dtype="float16")
+
+
+def test_simulation_decimate(model, steady, single_step):
+    tracer = Tracer_1D("t", 12500)
+    single_step.log = True
+    budget = 20 * 2 * 351 * 8
+    s = Simulation_1D(
+        model, steady, single_step, tracers=tracer, repeat=200, memory_budget=budget
+    )
+    s.run()
+    t = s.time_steps()
+    assert 10 <= len(t) <= 20
+    assert s.memory_usage() <= budget
+    assert t[-1] == pytest.approx(200000)
+    # evenly spaced snapshots, only the last one may be off the stride
+    assert np.diff(t[:-1]) == pytest.approx(np.full(len(t) - 2, t[1] - t[0]))
+    assert len(tracer.time) == len(t)
+    assert np.diff(tracer.time[1:-1]) == pytest.approx(
+        np.full(len(t) - 3, tracer.time[2] - tracer.time[1])
+    )
+
+
+def test_simulation_spill(model, steady, intrusion, single_step, tmp_path):
+    s = Simulation_1D(
+        model,
+        [steady, intrusion],
+        [single_step],
+        repeat=20,
+        memory_budget=0,
+        overflow="spill",
+        spill_dir=tmp_path,
+    )
+    s.run()
+    assert len(s._sols) == 21
+    assert s.memory_usage() == 2 * 351 * 8
+    assert s._sols[-1]["T"][0] == s._sols[0]["T"][0]
+    assert s._sols[20]["T"] == pytest.approx(s.model.T)
+    # temporary spill directory is removed with simulation
+    s = Simulation_1D(
+        model, steady, single_step, repeat=2, memory_budget=0, overflow="spill"
+    )
+    s.run()
+    spill_dir = s.spill_dir
+    assert len(list(Path(spill_dir).iterdir())) == 2 * 2
+    s.close()
+    assert not Path(spill_dir).exists()
+
+
+@pytest.mark.parametrize("transient", [False, True])
+def test_inversion_gradient(model, transient):
+    kwargs = {}
+    if transient:
+        dt = Time("1000", "year")
+        kwargs = dict(time=20 * abs(dt), solver=BTCS_1D(dt=dt, steps=20))
+    x = np.linspace(1000, 30000, 10)
+    inv = Inversion_1D(model, ["A.k", "A.H", "bc1"], x, 300, **kwargs)
+    theta = inv.x0 * 1.1
+    grad = inv.gradient(theta)
+    for i in range(len(theta)):
+        h = np.zeros(len(theta))
+        h[i] = 1e-5 * theta[i]
+        fd = (inv.misfit(theta + h) - inv.misfit(theta - h)) / (2 * h[i])
+        assert grad[i] == pytest.approx(fd, rel=1e-5)
+
+
+def test_inversion_optimize(model, steady):
+    from scipy.optimize import minimize
+
+    model.solve(steady)
+    x = np.linspace(1000, 30000, 10)
+    inv = Inversion_1D(model, ["A.k"], x, model.get_T(x))
+    res = minimize(inv.fun, [2.0], jac=True)
+    assert res.x[0] == pytest.approx(2.5, rel=1e-4)
+    inv.set_params(res.x)
+    assert model.domain.k[0] == pytest.approx(2.5, rel=1e-4)
+
+
+def test_simulation_sensitivities(tbc, steady, intrusion, single_step):
+    def run(k=2.5, H=1e-6, q=-0.032, **kwargs):
+        el = Element("A", dx=100, k=k, rho=2700, c=900, H=H)
+        model = Model_1D(Domain_1D(350 * el), tbc, Neumann_BC(q))
+        tracer = Tracer_1D("t", 12500)
+        single_step.log = True
+        s = Simulation_1D(
+            model, [steady, intrusion], single_step, tracers=tracer, repeat=5, **kwargs
+        )
+        s.run()
+        return s, tracer
+
+    s, tracer = run(sensitivities=["A.k", "A.H", "bc1"], covariance=[0.01, 0, 0])
+    base = dict(k=2.5, H=1e-6, q=-0.032)
+    for i, (key, value) in enumerate(base.items()):
+        h = 1e-6 * value
+        fd = (run(**{key: value + h})[0].model.T - s.model.T) / h
+        assert s.model.S[:, i] == pytest.approx(fd, rel=1e-4, abs=1e-6 * abs(fd).max())
+    std = s.uncertainty()
+    assert std[-1] == pytest.approx(0.1 * np.abs(s.model.S[:, 0]))
+    assert tracer.std([0.01, 0, 0])[-1] == pytest.approx(0.1 * abs(tracer.S[-1, 0]))
+    # without steady state sensitivities start from zero
+    tracer = Tracer_1D("u", 12500)
+    s2 = Simulation_1D(
+        s.model, intrusion, single_step, tracers=tracer, sensitivities=["A.k"], repeat=3
+    )
+    s2.run()
+    assert tracer.S.shape == (4, 1)
+    assert s2.uncertainty([0.01])[0] == pytest.approx(0)
+    assert np.all(s2.uncertainty([0.01])[-1] >= 0)
+    assert single_step._cache[-1]["parameters"] is s2.model.parameters
+    # sensitivities are not carried over to next simulation of the model
+    Simulation_1D(s.model, steady, single_step).run()
+    assert s.model.parameters is None and s.model.S is None
+
+
+def test_probes(model, steady, intrusion, single_step):
+    probe = Probe_1D("p", np.linspace(0, 40000, 101), capacity=4)
+    s = Simulation_1D(
+        model,
+        [steady, intrusion],
+        [Deform_1D(factors=0.99), BTCS_1D(dt=Time("500", "year"), steps=2)],
+        probes=probe,
+        repeat=10,
+    )
+    s.run()
+    assert probe.T.shape == (21, 101)
+    assert probe.time[-1] == pytest.approx(s.model._time_abs)
+    assert probe.T[-1] == pytest.approx(s.model.get_T(probe._x))
+    assert probe.T[0, -1] == pytest.approx(693)
+    with pytest.raises(AssertionError):
+        model.solve(Parareal_1D(dt=Time("500", "year"), steps=4, slices=2))
+    # later simulation of the same model does not sample previous probes
+    s = Simulation_1D(model, steady, single_step, repeat=2)
+    s.run()
+    assert model.probes == []
+    assert probe.T.shape == (21, 101)
+
+
+def test_deform_solver(model, steady):
+    tracer = Tracer_1D("t", 10000)
+    model.solve(steady)
+    model.solve(Deform_1D(factors=0.5, steps=2), tracers=[tracer])
+    assert model.domain.x[-1] == pytest.approx(35000 / 4)
+    assert tracer._x == pytest.approx(2500)
+
+
+def test_deform_schedule(model, steady):
+    n = len(model.domain.elements)
+    factors = np.ones((2, n))
+    factors[0, : n // 2] = 2
+    factors[1, n // 2 :] = 0.5
+    model.solve(steady)
+    model.solve(Deform_1D(factors=factors, steps=2))
+    assert model.domain.x[-1] == pytest.approx(35000 + 17500 / 2)
+    model.solve(Deform_1D(factors=lambda xm, t: np.where(xm < 35000, 0.5, 1)))
+    assert model.domain.x[-1] == pytest.approx(17500 + 17500 / 2)
+    with pytest.raises(ValueError):
+        model.domain.dx[:10] *= 2
+    with pytest.raises(AssertionError):
+        model.solve(Deform_1D(factors=np.where(model.domain.xm < 1000, 0, 1)))
+    assert model.domain.x[-1] == pytest.approx(17500 + 17500 / 2)
+
+
+@pytest.fixture
+def model_2d(tbc, bbc):
+    row = 5 * Element("A", dx=1000, k=2.5, rho=2700, c=900, H=1e-6)
+    return Model_2D(Domain_2D(350 * [row], dz=100), tbc, bbc, time_unit="year")
+
+
+@pytest.mark.parametrize("method", ["direct", "cg"])
+def test_steady_state_2d_solver(model_2d, model, steady, method):
+    model.solve(steady)
+    model_2d.solve(SteadyState_2D(method=method))
+    assert model_2d.T == pytest.approx(np.tile(model.T[:, None], 6))
+
+
+def test_steady_state_2d_reuse(tbc):
+    solver = SteadyState_2D()
+    for k in [1, 2, 4, 8]:
+        row = 2 * Element("A", dx=1000, k=k, H=0)
+        model = Model_2D(Domain_2D(10 * [row], dz=100), tbc, Neumann_BC(-0.0325))
+        model.solve(solver)
+        assert model.T[-1, 0] == pytest.approx(32.5 / k)
+    model.domain.k[:] = 2
+    model.solve(solver)
+    assert model.T[-1, 0] == pytest.approx(32.5 / 2)
+
+
+def test_simulation_2d(model_2d):
+    dike = SetTemperature_2D(xmin=2000, xmax=3000, zmin=10000, zmax=15000, value=700)
+    step = BTCS_2D(dt=Time("1000", "year"), log=True)
+    tracer = Tracer_2D("t", 2500, 12500)
+    s = Simulation_2D(
+        model_2d, [SteadyState_2D(log=True), dike], step, tracers=tracer, repeat=20
+    )
+    s.run()
+    assert len(tracer.T) == 21
+    assert tracer.T[-1] == pytest.approx(s.model.get_T(2500, 12500))
+    assert tracer.T[-1] < 700
+    assert s.model.get_T(0, 12500) > s.model.get_T(0, 500)
+    for method in (s.plot_field, s.uncertainty, lambda: s.run(live=True)):
+        with pytest.raises(NotImplementedError):
+            method()
+
+
+SCENARIO = """
+name = "intrusion"
+[model]
+time_unit = "year"
+[[layers]]
+name = "A"
+n = 350
+dx = 100
+k = 2.5
+H = "1 uW/m^3"
+rho = 2700
+c = 900
+[bc]
+top = {type = "dirichlet", value = 0}
+bottom = {type = "neumann", value = -0.032}
+[[init]]
+solver = "SteadyState"
+log = true
+[[init]]
+solver = "SetTemperature"
+xmin = "10 km"
+xmax = "15 km"
+value = 700
+[[sim]]
+solver = "BTCS"
+dt = "1000 year"
+log = true
+[simulation]
+repeat = 20
+[[tracers]]
+name = "A"
+x = "12.5 km"
+[sweep]
+"sim.0.steps" = [1, 2]
+"""
+
+
+def test_cli_scenario(tmp_path):
+    from heatlib.cli import main
+
+    path = tmp_path / "intrusion.toml"
+    path.write_text(SCENARIO)
+    assert main([str(path), "-o", str(tmp_path / "out"), "-j", "2"]) == 0
+    res = np.load(tmp_path / "out" / "intrusion_0000.npz")
+    assert res["T"].shape == (21, 351)
+    assert res["tracer_A_T"][-1] == pytest.approx(689.50185908)
+    assert (tmp_path / "out" / "intrusion_0001.npz").exists()
+
+
+def test_headless_import():
+    import subprocess
+    import sys
+
+    code = "import sys, heatlib.cli; assert 'matplotlib' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_job_service():
+    import asyncio
+    import tomllib
+
+    from heatlib.service import JobService
+
+    scenario = tomllib.loads(SCENARIO)
+    scenario.pop("sweep")
+
+    async def main():
+        async with JobService(workers=1, max_finished=2) as service:
+            job = await service.submit(scenario)
+            assert await service.submit(dict(scenario, name="copy")) is job
+            other = dict(scenario, simulation=dict(repeat=2))
+            queued = await service.submit(other, priority=1)
+            service.cancel(queued)
+            events = [kind async for kind, data in job.events()]
+            res = await job.result()
+            # running job is cancelled on shutdown
+            long = dict(scenario, simulation=dict(repeat=1000))
+            running = await service.submit(long)
+            async for kind, data in running.events():
+                break
+        with pytest.raises(asyncio.CancelledError):
+            await running.result()
+        return events, res, queued.state, job, running, service
+
+    events, res, state, job, running, service = asyncio.run(main())
+    assert events.count("snapshot") == 21
+    assert events[-1] == "done"
+    assert res["tracer_A_T"][-1] == pytest.approx(689.50185908)
+    assert state == "cancelled"
+    assert running.state == "cancelled"
+    assert [kind for kind, data in job.history] == ["done"]
+    assert list(service.jobs) == [job.id, running.id]
+
+
+def test_job_service_killed_worker():
+    import asyncio
+    import os
+    import signal
+    import tomllib
+
+    from heatlib.service import JobService
+
+    scenario = tomllib.loads(SCENARIO)
+    scenario.pop("sweep")
+
+    async def main():
+        async with JobService(workers=1) as service:
+            long = dict(scenario, simulation=dict(repeat=1000))
+            job = await service.submit(long)
+            kinds = set()
+            async for kind, data in job.events():
+                kinds.add(kind)
+                if len(kinds) == 2:
+                    break
+            assert len(job.history) == 2
+            for pid in list(service._pool._processes):
+                os.kill(pid, signal.SIGKILL)
+            with pytest.raises(RuntimeError):
+                await asyncio.wait_for(job.result(), 30)
+            # service keeps working with new pool
+            res = await (await service.submit(scenario)).result()
+        return job, res
+
+    job, res = asyncio.run(asyncio.wait_for(main(), 60))
+    assert job.state == "failed"
+    assert [kind for kind, data in job.history] == ["error"]
+    assert res["tracer_A_T"][-1] == pytest.approx(689.50185908)
+
+
+def test_downsample_index():
+    from heatlib.plotting import downsample_index
+
+    y = np.sin(np.linspace(0, 50, 100001))
+    y[5000] = 10
+    idx = downsample_index(y, 1000)
+    assert len(idx) <= 1000
+    assert idx[0] == 0 and idx[-1] == 100000
+    assert y[idx].max() == 10
+    assert y[idx].min() == y.min()
+
+
+@pytest.fixture
+def pyplot():
+    import matplotlib.pyplot as plt
+
+    yield plt
+    plt.close("all")
+
+
+def test_plotting(model, steady, intrusion, single_step, pyplot):
+    s = Simulation_1D(model, [steady, intrusion], [single_step], repeat=30)
+    s.run(live=True)
+    assert not pyplot.isinteractive()
+    s.plot()
+    s.plot(solutions=[0, 10, 20])
+    s.plot_field()
+    model.domain.show()